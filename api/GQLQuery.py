@@ -1,177 +1,850 @@
-from flask import Response
+from prometheus_client import Counter, Gauge, Histogram
 import aiohttp
 import asyncio
 import logging
 import json
-from time import time
-from asyncio import sleep
-from typing import Optional, Dict, Any, List
-from core.utils.cache import InMemoryCache
+from collections import OrderedDict
+from datetime import datetime, timezone
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from time import time, monotonic
+from hashlib import sha1
+from typing import Optional, Dict, Any, List, Iterable, Iterator, FrozenSet, Callable, Tuple
+from core.utils.cache import CacheSweeper, InMemoryCache
+from core.utils.codec import ZlibJsonCodec
+from core.utils.tiered_cache import TieredCache
+from core.utils.singleflight import SingleFlight
+from core.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.utils.session_provider import SessionCredentials, SessionProvider, default_session_provider
+from core.utils.rate_limiter import create_rate_limiter
+from core.utils.adaptive_limiter import AIMDLimiter
+from core.utils.redis_client import create_async_redis
+from core.utils.global_cache import GlobalDataCache
+from core.utils.contest_schedule import contest_data_ttl
+from core.utils.query_builder import (
+    build_selection_tree,
+    field_set,
+    merge_selections,
+    render_selection,
+    select_fields,
+    unknown_field_paths,
+)
 
 logger = logging.getLogger(__name__)
 
-# Rate limiting constants
+# Rate limiting constants, shared by all workers and pods when Redis is configured
 RATE_LIMIT_REQUESTS = 20  # Number of requests allowed
 RATE_LIMIT_PERIOD = 30    # Time period in seconds
-DELAY_BETWEEN_REQUESTS = 0.2  # Delay between requests in seconds
+RATE_LIMIT_BURST = 5      # Requests that may be sent back to back
+
+# Adaptive (AIMD) limits; the rate starts at RATE_LIMIT_REQUESTS / RATE_LIMIT_PERIOD
+ADAPTIVE_MIN_RATE = 0.1             # Requests per second the rate is never cut below
+ADAPTIVE_MAX_RATE = 5.0             # Requests per second the rate never grows above
+ADAPTIVE_RATE_INCREASE = 0.05       # Requests per second added per window of healthy responses
+ADAPTIVE_INITIAL_CONCURRENCY = 4    # Upstream calls in flight at start
+ADAPTIVE_MAX_CONCURRENCY = 20       # Upper bound for calls in flight (CONNECTOR_LIMIT_PER_HOST)
+ADAPTIVE_DECREASE_FACTOR = 0.5      # Multiplier applied to both limits on overload
+ADAPTIVE_LATENCY_SPIKE = 3.0        # Latency above this multiple of the moving average counts as overload
+ADAPTIVE_COOLDOWN = 5               # Seconds between two cuts
+
+# Upstream priority classes; lower values are admitted first
+PRIORITY_INTERACTIVE = 0    # A user is waiting for the response
+PRIORITY_REFRESH = 1        # Background refreshes of cached data (stale-while-revalidate, warming)
+PRIORITY_BULK = 2           # Batch jobs such as the catalog sync
+# Share of the concurrency limit each class may hold, so background work never fills every slot
+PRIORITY_SLOT_SHARES = {PRIORITY_INTERACTIVE: 1.0, PRIORITY_REFRESH: 0.5, PRIORITY_BULK: 0.25}
+
+# Connection pool constants (one pool per worker process)
+CONNECTOR_LIMIT = 100           # Max open connections in the pool
+CONNECTOR_LIMIT_PER_HOST = 20   # Max open connections to leetcode.com
+DNS_CACHE_TTL = 300             # Seconds to cache resolved DNS entries
+KEEPALIVE_TIMEOUT = 60          # Seconds an idle connection is kept open
+REQUEST_TIMEOUT = 30            # Total timeout for a single request in seconds
+CONNECT_TIMEOUT = 10            # Timeout for acquiring a connection in seconds
+
+# Retry and circuit breaker constants for upstream GraphQL calls
+ATTEMPT_TIMEOUT = 10            # Seconds allowed for one attempt
+CALL_DEADLINE = 25              # Seconds allowed for a call including retries and backoff
+MAX_RETRIES = 3                 # Retries after the first attempt
+BACKOFF_BASE = 0.5              # First backoff ceiling in seconds, doubled per retry
+BACKOFF_MAX = 8                 # Largest backoff ceiling in seconds
+CIRCUIT_FAILURE_THRESHOLD = 5   # Consecutive failures that open the circuit
+CIRCUIT_RESET_TIMEOUT = 30      # Seconds the circuit stays open before a trial call
+
+# Seconds expired user data may still be served while a background refresh runs
+STALE_GRACE_PERIOD = 600
+
+# Cache limits; negative entries are capped separately so unknown usernames cannot push out real data
+CACHE_MAX_ENTRIES = 20000
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+NEGATIVE_CACHE_MAX_ENTRIES = 2000
+
+LEETCODE_URL = "https://leetcode.com"
+GRAPHQL_URL = "https://leetcode.com/graphql"
+
+# Upstream metrics
+UPSTREAM_REQUESTS = Counter('leetcode_upstream_requests_total', 'Upstream GraphQL calls by final outcome', ['outcome'])
+UPSTREAM_RETRIES = Counter('leetcode_upstream_retries_total', 'Upstream GraphQL retries', ['reason'])
+UPSTREAM_LATENCY = Histogram('leetcode_upstream_request_duration_seconds', 'Upstream GraphQL attempt latency')
+UPSTREAM_CONCURRENCY_LIMIT = Gauge('leetcode_upstream_concurrency_limit', 'Adaptive limit of upstream calls in flight')
+UPSTREAM_RATE_LIMIT = Gauge('leetcode_upstream_rate_limit', 'Adaptive upstream request rate in requests per second')
+UPSTREAM_CIRCUIT_STATE = Gauge('leetcode_upstream_circuit_state', 'Upstream circuit state (0 closed, 1 half-open, 2 open)')
+NEGATIVE_CACHE_HITS = Counter('leetcode_user_negative_cache_hits_total', 'Lookups answered by the negative cache')
+NEGATIVE_CACHE_STORES = Counter('leetcode_user_negative_cache_stores_total', 'Users negatively cached', ['reason'])
+UPSTREAM_CIRCUIT_REJECTIONS = Counter('leetcode_upstream_circuit_rejections_total', 'Calls rejected while the circuit was open')
+CIRCUIT_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+_upstream_priority: ContextVar[int] = ContextVar('upstream_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def upstream_priority(priority: int) -> Iterator[None]:
+    """Make upstream calls in this context, and tasks started from it, use the given priority class."""
+    token = _upstream_priority.set(priority)
+    try:
+        yield
+    finally:
+        _upstream_priority.reset(token)
+
+
+class UpstreamError(Exception):
+    """Raised when LeetCode cannot be reached within the retry budget."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+# Every user field the batched query can request, as dotted paths ({a,b} expands to both)
+USER_DATA_FIELDS = [
+    "matchedUser.username",
+    "matchedUser.profile.{realName,userAvatar,birthday,ranking,reputation,websites,countryName}",
+    "matchedUser.profile.{company,school,skillTags,aboutMe,starRating}",
+    "matchedUser.submitStats.{acSubmissionNum,totalSubmissionNum}.{difficulty,count,submissions}",
+    "matchedUser.tagProblemCounts.{advanced,intermediate,fundamental}.{tagName,tagSlug,problemsSolved}",
+    "matchedUser.contributions.points",
+    "matchedUser.badges.{id,displayName,icon,creationDate}",
+    "matchedUser.upcomingBadges.{name,icon}",
+    "matchedUser.activeBadge.{id,displayName,icon,creationDate}",
+    "matchedUser.userCalendar.{activeYears,streak,totalActiveDays,submissionCalendar}",
+    "matchedUser.userCalendar.dccBadges.timestamp",
+    "matchedUser.userCalendar.dccBadges.badge.{name,icon}",
+    "matchedUser.problemsSolvedBeatsStats.{difficulty,percentage}",
+    "userContestRanking.{attendedContestsCount,rating,globalRanking,totalParticipants,topPercentage}",
+    "userContestRanking.badge.name",
+    "userContestRankingHistory.{attended,rating,ranking,trendDirection,problemsSolved,totalProblems}",
+    "userContestRankingHistory.finishTimeInSeconds",
+    "userContestRankingHistory.contest.{title,startTime}",
+    "allQuestionsCount.{difficulty,count}",
+]
+USER_DATA_CATALOG = build_selection_tree(USER_DATA_FIELDS)
+
+# Volatility tiers of the user data, as field path prefixes. Each fragment is
+# cached separately under the InMemoryCache data type of the same name, so
+# slow-changing parts outlive the volatile ones
+USER_DATA_FRAGMENTS = {
+    "profile_meta": [
+        "matchedUser.username", "matchedUser.profile", "matchedUser.contributions",
+        "matchedUser.badges", "matchedUser.upcomingBadges", "matchedUser.activeBadge",
+    ],
+    "tag_counts": [
+        "matchedUser.submitStats", "matchedUser.tagProblemCounts",
+        "matchedUser.problemsSolvedBeatsStats",
+    ],
+    "calendar": ["matchedUser.userCalendar"],
+    "contest_ranking": ["userContestRanking"],
+    "contest_history": ["userContestRankingHistory"],
+}
+
+# Fragments that only change after a contest; cached until the next contest update
+CONTEST_FRAGMENTS = ("contest_ranking", "contest_history")
+CONTEST_TRACKED_USERS = 5000  # Most users whose contest data is refreshed after a contest
+
+# Site-wide root fields; they are the same for every user, so they are fetched
+# once through the global data cache and injected into user payloads
+GLOBAL_ROOT_FIELDS = ["allQuestionsCount"]
+
+# Aliases for fields whose response key differs from the schema field
+USER_FIELD_EXPRESSIONS = {
+    "matchedUser.submitStats": "submitStats: submitStatsGlobal",
+}
+
+# Root fields taking the username argument, with their alias suffix in multi-user queries
+USER_ROOT_FIELDS = {
+    "matchedUser": "",
+    "userContestRanking": "_contestRanking",
+    "userContestRankingHistory": "_contestHistory",
+}
+
+
+def normalize_user_fields(fields: Iterable[str]) -> FrozenSet[str]:
+    """Expand and validate user field paths; matchedUser.username is always included."""
+    unknown = unknown_field_paths(fields, USER_DATA_CATALOG)
+    if unknown:
+        raise ValueError(f"Unknown user data fields: {', '.join(unknown)}")
+    return field_set(fields) | {"matchedUser.username"}
+
+
+def split_global_fields(fields: Iterable[str]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Split field paths into (per-user fields, site-wide fields)."""
+    fields = field_set(fields)
+    global_fields = frozenset(path for path in fields if path.split(".")[0] in GLOBAL_ROOT_FIELDS)
+    return fields - global_fields, global_fields
+
+
+def split_fields_by_fragment(fields: Iterable[str]) -> Dict[str, FrozenSet[str]]:
+    """Group expanded field paths by the USER_DATA_FRAGMENTS fragment they belong to."""
+    by_fragment: Dict[str, set] = {}
+    for path in fields:
+        for fragment, prefixes in USER_DATA_FRAGMENTS.items():
+            if any(path == prefix or path.startswith(f"{prefix}.") for prefix in prefixes):
+                by_fragment.setdefault(fragment, set()).add(path)
+                break
+        else:
+            raise ValueError(f"User data field belongs to no fragment: {path}")
+    return {fragment: frozenset(paths) for fragment, paths in by_fragment.items()}
+
+
+def build_user_query(fields: Iterable[str]) -> str:
+    """Build the single-user query selecting only the given fields."""
+    tree = build_selection_tree(sorted(fields))
+    selections = []
+    for root, children in tree.items():
+        field = f"{root}(username: $username)" if root in USER_ROOT_FIELDS else root
+        selections.append(f"{field} {render_selection(children, USER_FIELD_EXPRESSIONS, root, 2)}")
+    body = "\n    ".join(selections)
+    return f"query UserCompleteData($username: String!) {{\n    {body}\n}}"
+
+
+def build_global_query(fields: Iterable[str]) -> str:
+    """Build the query selecting the given site-wide fields."""
+    tree = build_selection_tree(sorted(fields))
+    selections = [f"{root} {render_selection(children, USER_FIELD_EXPRESSIONS, root, 2)}"
+                  for root, children in tree.items()]
+    body = "\n    ".join(selections)
+    return f"query GlobalData {{\n    {body}\n}}"
+
 
 # Batched query for fetching all user data at once
-BATCH_QUERY = """
-query UserCompleteData($username: String!) {
+BATCH_QUERY = build_user_query(normalize_user_fields(USER_DATA_FIELDS))
+
+# Every site-wide field, fetched together so one cached copy serves every request
+GLOBAL_DATA_FIELDS = split_global_fields(USER_DATA_FIELDS)[1]
+GLOBAL_DATA_QUERY = build_global_query(GLOBAL_DATA_FIELDS)
+
+# Default number of users fetched per aliased multi-user query
+BATCH_CHUNK_SIZE = 10
+# Chunks of one batch in flight at a time; the call deadline includes the
+# rate limiter wait, so queueing every chunk at once would time most of them out
+BATCH_CONCURRENCY = 2
+
+# Submission calendar for one year; activeYears lists every year the user was active
+CALENDAR_QUERY = """
+query UserCalendarYear($username: String!, $year: Int!) {
     matchedUser(username: $username) {
-        username
-        profile {
-            realName
-            userAvatar
-            birthday
-            ranking
-            reputation
-            websites
-            countryName
-            company
-            school
-            skillTags
-            aboutMe
-            starRating
-        }
-        submitStats: submitStatsGlobal {
-            acSubmissionNum {
-                difficulty
-                count
-                submissions
-            }
-            totalSubmissionNum {
-                difficulty
-                count
-                submissions
-            }
-        }
-        tagProblemCounts {
-            advanced {
-                tagName
-                tagSlug
-                problemsSolved
-            }
-            intermediate {
-                tagName
-                tagSlug
-                problemsSolved
-            }
-            fundamental {
-                tagName
-                tagSlug
-                problemsSolved
-            }
-        }
-        contributions {
-            points
-        }
-        badges {
-            id
-            displayName
-            icon
-            creationDate
-        }
-        upcomingBadges {
-            name
-            icon
-        }
-        activeBadge {
-            id
-            displayName
-            icon
-            creationDate
-        }
-        userCalendar {
+        userCalendar(year: $year) {
             activeYears
             streak
             totalActiveDays
-            dccBadges {
-                timestamp
-                badge {
-                    name
-                    icon
-                }
-            }
             submissionCalendar
         }
-        problemsSolvedBeatsStats {
-            difficulty
-            percentage
-        }
-    }
-    userContestRanking(username: $username) {
-        attendedContestsCount
-        rating
-        globalRanking
-        totalParticipants
-        topPercentage
-        badge {
-            name
-        }
-    }
-    userContestRankingHistory(username: $username) {
-        attended
-        rating
-        ranking
-        trendDirection
-        problemsSolved
-        totalProblems
-        finishTimeInSeconds
-        contest {
-            title
-            startTime
-        }
-    }
-    allQuestionsCount {
-        difficulty
-        count
     }
 }
 """
 
 
+def build_multi_user_query(count: int, fields: Iterable[str] = USER_DATA_FIELDS) -> str:
+    """Build one GraphQL document fetching the given fields for count users.
+
+    User i is bound to variable $u<i> and its root fields are aliased u<i>,
+    u<i>_contestRanking and u<i>_contestHistory. Site-wide fields such as
+    allQuestionsCount are left out; they come from the global data cache.
+    """
+    tree = build_selection_tree(sorted(fields))
+    variables = ", ".join(f"$u{i}: String!" for i in range(count))
+    selections = []
+    for i in range(count):
+        for root, suffix in USER_ROOT_FIELDS.items():
+            if root in tree:
+                selection = render_selection(tree[root], USER_FIELD_EXPRESSIONS, root, 2)
+                selections.append(f"u{i}{suffix}: {root}(username: $u{i}) {selection}")
+    body = "\n    ".join(selections)
+    return f"query MultiUserCompleteData({variables}) {{\n    {body}\n}}"
+
+
 class GQLQuery:
-    def __init__(self, session_cookie=None):
+    def __init__(self, session_cookie=None,
+                 connector_limit: int = CONNECTOR_LIMIT,
+                 connector_limit_per_host: int = CONNECTOR_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = DNS_CACHE_TTL,
+                 keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+                 request_timeout: float = REQUEST_TIMEOUT,
+                 connect_timeout: float = CONNECT_TIMEOUT,
+                 rate_limiter=None,
+                 fields: Optional[Iterable[str]] = None,
+                 attempt_timeout: float = ATTEMPT_TIMEOUT,
+                 call_deadline: float = CALL_DEADLINE,
+                 max_retries: int = MAX_RETRIES,
+                 session_provider: Optional[SessionProvider] = None,
+                 stale_grace: int = STALE_GRACE_PERIOD,
+                 shared_cache=None):
         self.session_cookie = session_cookie
-        self._request_timestamps = []  # Track request timestamps for rate limiting
+        # Bootstrapped cookie/CSRF token, shared process-wide unless a cookie is given
+        self._session_provider = session_provider or default_session_provider
+        # Fields that make up this client's "complete" user data
+        self._fields = normalize_user_fields(fields or USER_DATA_FIELDS)
+        user_fields, self._global_fields = split_global_fields(self._fields)
+        self._fragment_fields = split_fields_by_fragment(user_fields)
+        # Users with cached contest data, refreshed together after each contest
+        self._contest_users: "OrderedDict[str, None]" = OrderedDict()
+        redis = self._redis = create_async_redis()
+        # Token bucket shared through Redis when REDIS_HOST is set, per process otherwise
+        self._rate_limiter = rate_limiter or create_rate_limiter(
+            RATE_LIMIT_REQUESTS / RATE_LIMIT_PERIOD, RATE_LIMIT_BURST, redis)
+        # Site-wide fields, shared through Redis in the same way
+        self._global_cache = GlobalDataCache(redis)
+        # Grows the rate and concurrency while upstream is healthy, cuts them on 429s and spikes
+        self._limiter = AIMDLimiter(
+            self._rate_limiter,
+            initial_rate=RATE_LIMIT_REQUESTS / RATE_LIMIT_PERIOD,
+            min_rate=ADAPTIVE_MIN_RATE,
+            max_rate=ADAPTIVE_MAX_RATE,
+            initial_concurrency=ADAPTIVE_INITIAL_CONCURRENCY,
+            min_concurrency=1,
+            max_concurrency=ADAPTIVE_MAX_CONCURRENCY,
+            rate_increase=ADAPTIVE_RATE_INCREASE,
+            decrease_factor=ADAPTIVE_DECREASE_FACTOR,
+            spike_factor=ADAPTIVE_LATENCY_SPIKE,
+            cooldown=ADAPTIVE_COOLDOWN,
+            slot_shares=PRIORITY_SLOT_SHARES,
+            on_change=self._export_limits)
         self._session: Optional[aiohttp.ClientSession] = None
-        self._cache = InMemoryCache()
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connector_limit = connector_limit
+        self._connector_limit_per_host = connector_limit_per_host
+        self._dns_cache_ttl = dns_cache_ttl
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = aiohttp.ClientTimeout(total=request_timeout, connect=connect_timeout)
+        # Per-process cache, in front of a tier shared by all workers (shared_cache, an
+        # asyncio Redis client or LocalStore, defaults to Redis when REDIS_HOST is set)
+        # Entries are stored zlib-compressed and decoded on each hit
+        codec = ZlibJsonCodec()
+        self._cache = TieredCache(
+            InMemoryCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES,
+                          quotas={'negative': NEGATIVE_CACHE_MAX_ENTRIES}, codec=codec, name='user_data'),
+            shared_cache or redis, codec=codec)
+        # Removes expired entries nobody reads again; runs until close()
+        self._cache_sweeper = CacheSweeper(self._cache)
+        self._cache_sweeper.start()
+        for fragment in USER_DATA_FRAGMENTS:
+            self._cache.set_grace(fragment, stale_grace)
+        self._inflight = SingleFlight()  # Coalesces concurrent fetches of the same key
+        # Called with the username of every complete data lookup (see cache_warmer)
+        self.access_listener: Optional[Callable[[str], None]] = None
+        self._attempt_timeout = attempt_timeout
+        self._call_deadline = call_deadline
+        self._max_retries = max_retries
+        self._circuit = CircuitBreaker(
+            CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT,
+            on_state_change=lambda state: UPSTREAM_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state]))
 
-    async def get_user_complete_data(self, username: str) -> Dict[str, Any]:
-        """Fetch all user data in a single batched query with caching."""
-        cache_key = f"user_complete_data:{username}"
-        cached_data = self._cache.get(cache_key)
-        if cached_data:
-            logger.debug(f"Cache hit for {username}'s complete data")
-            return cached_data
+    async def get_user_complete_data(self, username: str,
+                                     fields: Optional[Iterable[str]] = None,
+                                     allow_stale: bool = True) -> Dict[str, Any]:
+        """Fetch user data, cached per volatility fragment.
+
+        The data is split into USER_DATA_FRAGMENTS, each cached under its own
+        TTL; the fragments covering the requested fields (the client's field
+        set by default) are merged into one response. Missing and expired
+        fragments are re-fetched together in one combined query. When every
+        fragment is cached but some are only stale (within the grace window),
+        the stale view is returned at once and those fragments are refreshed
+        in the background, unless allow_stale is False.
+        """
+        if self.access_listener:
+            self.access_listener(username)
+        if self._negative_hit(username):
+            return {}
+
+        if fields is None:
+            wanted, global_fields = self._fragment_fields, self._global_fields
+        else:
+            user_fields, global_fields = split_global_fields(normalize_user_fields(fields))
+            wanted = split_fields_by_fragment(user_fields)
+        # Misses are counted once the shared tier has been tried, so data another
+        # worker fetched counts as one hit rather than a miss and then a hit
+        cached_data, missing, stale = self._get_cached_fragments(username, wanted, allow_stale, record_miss=False)
+        if missing:
+            # Another worker may have fetched the fragments, or found the user missing
+            if await self._cache.load(self._shared_keys(username, missing)) and self._negative_hit(username):
+                return {}
+            loaded, missing, loaded_stale = self._get_cached_fragments(
+                username, {fragment: wanted[fragment] for fragment in missing}, allow_stale)
+            cached_data = merge_selections(cached_data, loaded)
+            stale += loaded_stale
+        if not missing:
+            if stale:
+                logger.info(f"Serving stale {', '.join(stale)} data for {username} while it refreshes")
+                self._start_refresh(username, {fragment: wanted[fragment] for fragment in stale})
+            logger.debug(f"Cache hit for {username}'s data")
+            return await self._with_global_data(cached_data, global_fields)
+
+        to_fetch = {fragment: wanted[fragment] for fragment in missing + stale}
+        logger.debug(f"Fetching {', '.join(sorted(to_fetch))} data for {username}")
+        # Concurrent misses for the same user and fragments share a single upstream call
+        # (per priority class, so a user request never waits behind a background one)
+        fetched = await self._inflight.do(
+            self._fragments_key(username, to_fetch, _upstream_priority.get()),
+            lambda: self._fetch_fragments(username, to_fetch))
+        if not fetched:
+            return {}
+        return await self._with_global_data(merge_selections(cached_data, fetched), global_fields)
+
+    async def get_global_data(self) -> Dict[str, Any]:
+        """Return the site-wide fields (GLOBAL_DATA_FIELDS), fetched once per TTL per worker or cluster."""
+        return await self._global_cache.get("site_data", self._fetch_global_data) or {}
+
+    async def _fetch_global_data(self) -> Optional[Dict[str, Any]]:
+        try:
+            # Shared by every waiting caller, whatever class the first one was in
+            with upstream_priority(PRIORITY_INTERACTIVE):
+                response = await self._call_api({"query": GLOBAL_DATA_QUERY, "operationName": "GlobalData"}, "")
+        except UpstreamError as e:
+            logger.error(f"Failed to fetch global data: {str(e)}")
+            return None
+        return (response or {}).get('data') or None
+
+    async def _with_global_data(self, data: Dict[str, Any], global_fields: FrozenSet[str]) -> Dict[str, Any]:
+        """Inject the requested site-wide fields into a user payload."""
+        if not global_fields:
+            return data
+        global_data = await self.get_global_data()
+        return merge_selections(data, select_fields(global_data, build_selection_tree(global_fields)))
+
+    def _get_cached_fragments(self, username: str, wanted: Dict[str, FrozenSet[str]], allow_stale: bool,
+                              record_miss: bool = True) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """Merge the cached fragments covering wanted; return (data, missing fragments, stale fragments)."""
+        data: Dict[str, Any] = {}
+        missing: List[str] = []
+        stale: List[str] = []
+        for fragment, fragment_fields in wanted.items():
+            key = f"user_fragment:{fragment}:{username}"
+            if allow_stale:
+                entry, is_stale = self._cache.get_with_staleness(key, fragment, record_miss)
+            else:
+                entry, is_stale = self._cache.get(key, fragment, record_miss), False
+            if entry is None or not fragment_fields.issubset(entry["fields"]):
+                missing.append(fragment)
+                continue
+            if is_stale:
+                stale.append(fragment)
+            data = merge_selections(data, entry["data"])
+        return data, missing, stale
 
-        logger.info(f"Fetching complete data for user: {username}")
+    def _fragment_fields_to_fetch(self, fragments: Dict[str, FrozenSet[str]]) -> Dict[str, FrozenSet[str]]:
+        """Widen each fragment to the client's fields too, so one cached copy serves every request."""
+        return {
+            fragment: fragment_fields | self._fragment_fields.get(fragment, frozenset())
+            for fragment, fragment_fields in fragments.items()
+        }
+
+    @staticmethod
+    def _shared_keys(username: str, fragments: Iterable[str]) -> List[str]:
+        """Cache keys of username's fragments and negative entry, for loading from the shared tier."""
+        return [f"user_fragment:{fragment}:{username}" for fragment in fragments] + [f"user_missing:{username}"]
+
+    @staticmethod
+    def _fragments_key(username: str, fragments: Dict[str, FrozenSet[str]], priority: int) -> str:
+        fields = sorted(field for fragment_fields in fragments.values() for field in fragment_fields)
+        signature = sha1(",".join(fields).encode()).hexdigest()[:12]
+        return f"user_fragments:{priority}:{signature}:{username}"
+
+    def _start_refresh(self, username: str, fragments: Dict[str, FrozenSet[str]]) -> None:
+        self._inflight.start(self._fragments_key(username, fragments, PRIORITY_REFRESH),
+                             lambda: self._revalidate(username, fragments))
+
+    async def _revalidate(self, username: str, fragments: Dict[str, FrozenSet[str]]) -> Dict[str, Any]:
+        """Background refresh of stale fragments; failures keep the stale values."""
+        try:
+            if await self._cache.load(self._shared_keys(username, fragments)):
+                data, missing, stale = self._get_cached_fragments(username, fragments, allow_stale=True)
+                if not missing and not stale:
+                    return data
+            with upstream_priority(PRIORITY_REFRESH):
+                return await self._fetch_fragments(username, fragments)
+        except Exception as e:
+            logger.warning(f"Background refresh for {username} failed: {str(e)}")
+            return {}
+
+    async def _fetch_fragments(self, username: str, fragments: Dict[str, FrozenSet[str]]) -> Dict[str, Any]:
+        """Fetch the given fragments in one query and cache each of them on success."""
+        fragments = self._fragment_fields_to_fetch(fragments)
+        fields = frozenset().union(*fragments.values())
+        logger.info(f"Fetching {', '.join(sorted(fragments))} data for user: {username}")
         query = {
-            "query": BATCH_QUERY,
+            "query": build_user_query(fields),
             "variables": {"username": username}
         }
 
         response = await self._call_api(query, username)
         logger.info(f"Raw API response: {json.dumps(response, indent=2)}")
-        
-        if response and 'data' in response:
+
+        data = response.get('data') if response else None
+        selects_user = any(field.startswith("matchedUser.") for field in fields)
+        if data and (data.get('matchedUser') or not selects_user):
             logger.info(f"Received valid data for user: {username}")
-            logger.debug(f"Data structure: {json.dumps(response['data'], indent=2)}")
-            self._cache.set(cache_key, response['data'], 'profile')
-            return response['data']
+            logger.debug(f"Data structure: {json.dumps(data, indent=2)}")
+            await self._store_fragments(username, data, fragments)
+            return data
 
-        logger.error(f"Failed to fetch complete data for {username}")
-        logger.error(f"Response structure: {json.dumps(response, indent=2) if response else 'No response'}")
+        if data:
+            logger.warning(f"User not found: {username}")
+            await self._remember_missing(username, 'not_found')
+        else:
+            logger.error(f"Failed to fetch complete data for {username}")
+            logger.error(f"Response structure: {json.dumps(response, indent=2) if response else 'No response'}")
+            await self._remember_missing(username, 'empty')
         return {}
 
+    async def _store_fragments(self, username: str, data: Dict[str, Any],
+                               fragments: Dict[str, FrozenSet[str]]) -> None:
+        """Cache each fragment's part of a response under the fragment's own TTL.
+
+        Contest fragments are kept until the next contest update instead.
+        """
+        items = []
+        for fragment, fragment_fields in fragments.items():
+            ttl = None
+            if fragment in CONTEST_FRAGMENTS:
+                ttl = contest_data_ttl()
+                self._contest_users[username] = None
+                self._contest_users.move_to_end(username)
+                if len(self._contest_users) > CONTEST_TRACKED_USERS:
+                    self._contest_users.popitem(last=False)
+            items.append((f"user_fragment:{fragment}:{username}", {
+                "fields": sorted(fragment_fields),
+                "data": select_fields(data, build_selection_tree(fragment_fields))
+            }, fragment, ttl))
+        await self._cache.set_many(items)
+
+    async def _remember_missing(self, username: str, reason: str) -> None:
+        """Negatively cache a user that does not exist or returned no data."""
+        NEGATIVE_CACHE_STORES.labels(reason=reason).inc()
+        await self._cache.set(f"user_missing:{username}", reason, 'negative')
+
+    def is_known_missing(self, username: str) -> bool:
+        """Return True if username is negatively cached.
+
+        Checked for every lookup, so it reads the expiry only and records no
+        cache hit or miss; negative hits have their own counter.
+        """
+        ttl = self._cache.ttl_remaining(f"user_missing:{username}")
+        return ttl is not None and ttl > 0
+
+    def _negative_hit(self, username: str) -> bool:
+        """Check the negative cache on a lookup path, counting hits."""
+        if not self.is_known_missing(username):
+            return False
+        NEGATIVE_CACHE_HITS.inc()
+        logger.debug(f"Negative cache hit for {username}")
+        return True
+
+    async def get_users_complete_data(self, usernames: List[str],
+                                      chunk_size: int = BATCH_CHUNK_SIZE) -> Dict[str, Dict[str, Any]]:
+        """Fetch complete data for many users, batching cache misses into aliased queries.
+
+        Returns a dict mapping each username to the same payload
+        get_user_complete_data would return, or {} if the user was not found.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, List[str]] = {}  # username -> fragments missing from L1
+        partial: Dict[str, Dict[str, Any]] = {}  # username -> merged fragments found in L1
+        for username in dict.fromkeys(usernames):
+            if self._negative_hit(username):
+                results[username] = {}
+                continue
+            # Misses are counted after the shared tier lookup below
+            cached_data, missing_fragments, _ = self._get_cached_fragments(
+                username, self._fragment_fields, allow_stale=False, record_miss=False)
+            if missing_fragments:
+                missing[username] = missing_fragments
+                partial[username] = cached_data
+            else:
+                results[username] = await self._with_global_data(cached_data, self._global_fields)
+
+        # One shared tier round trip for every L1 miss, then fetch what no worker has
+        if missing:
+            loaded = await self._cache.load(
+                key for username, fragments in missing.items() for key in self._shared_keys(username, fragments))
+            for username, fragments in list(missing.items()):
+                if loaded and self._negative_hit(username):
+                    results[username] = {}
+                    del missing[username]
+                    continue
+                cached_data, missing_fragments, _ = self._get_cached_fragments(
+                    username, {fragment: self._fragment_fields[fragment] for fragment in fragments},
+                    allow_stale=False)
+                if not missing_fragments:
+                    results[username] = await self._with_global_data(
+                        merge_selections(partial[username], cached_data), self._global_fields)
+                    del missing[username]
+
+        logger.info(f"Batch fetch for {len(usernames)} users: {len(results)} cached, {len(missing)} to fetch")
+        results.update(await self._fetch_users_chunks(list(missing), chunk_size))
+
+        return {username: results.get(username, {}) for username in usernames}
+
+    async def refresh_users_complete_data(self, usernames: List[str],
+                                          chunk_size: int = BATCH_CHUNK_SIZE,
+                                          fragments: Optional[Iterable[str]] = None) -> int:
+        """Re-fetch users' data regardless of the cache; return how many were refreshed.
+
+        fragments names the fragments to re-fetch, every fragment of the
+        client's field set by default.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be positive")
+        selected = self._fragment_fields
+        if fragments is not None:
+            wanted = set(fragments)
+            selected = {fragment: fields for fragment, fields in self._fragment_fields.items()
+                        if fragment in wanted}
+            if not selected:
+                return 0
+        return len(await self._fetch_users_chunks(list(dict.fromkeys(usernames)), chunk_size, selected))
+
+    async def refresh_contest_data(self, usernames: List[str],
+                                   chunk_size: int = BATCH_CHUNK_SIZE) -> int:
+        """Re-fetch only the contest fragments of users; return how many were refreshed."""
+        return await self.refresh_users_complete_data(usernames, chunk_size, CONTEST_FRAGMENTS)
+
+    @property
+    def cache(self):
+        """The client's user data cache (a TieredCache over an InMemoryCache)."""
+        return self._cache
+
+    @property
+    def redis(self):
+        """The asyncio Redis client shared state goes through, or None without REDIS_HOST."""
+        return self._redis
+
+    async def load_shared_user_data(self, usernames: Iterable[str], min_ttl: float = 0) -> int:
+        """Copy users' data cached by other workers into this one; return how many entries were copied.
+
+        Fragments with more than min_ttl seconds left in this worker are not looked up.
+        """
+        keys = (key for username in usernames for key in self._shared_keys(username, self._fragment_fields))
+        return await self._cache.load(keys, min_ttl)
+
+    def contest_users(self) -> List[str]:
+        """Return the users whose contest data was cached, least recently stored first."""
+        return list(self._contest_users)
+
+    def due_fragments(self, username: str, within: float) -> List[str]:
+        """Return username's fragments that are not cached or expire within the given seconds."""
+        due = []
+        for fragment in self._fragment_fields:
+            ttl = self._cache.ttl_remaining(f"user_fragment:{fragment}:{username}")
+            if ttl is None or ttl <= within:
+                due.append(fragment)
+        return due
+
+    async def _fetch_users_chunks(self, usernames: List[str], chunk_size: int,
+                                  fragments: Optional[Dict[str, FrozenSet[str]]] = None) -> Dict[str, Dict[str, Any]]:
+        """Fetch usernames in chunks, at most BATCH_CONCURRENCY at a time.
+
+        A failed chunk is logged and its users left out of the result; the
+        other chunks still complete.
+        """
+        chunks = [usernames[i:i + chunk_size] for i in range(0, len(usernames), chunk_size)]
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def fetch(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+            async with semaphore:
+                return await self._fetch_users_chunk(chunk, fragments)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        outcomes = await asyncio.gather(*(fetch(chunk) for chunk in chunks), return_exceptions=True)
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Batch fetch failed for users {', '.join(chunk)}: {str(outcome)}")
+            else:
+                results.update(outcome)
+        return results
+
+    async def _fetch_users_chunk(self, usernames: List[str],
+                                 fragments: Optional[Dict[str, FrozenSet[str]]] = None) -> Dict[str, Dict[str, Any]]:
+        """Fetch one aliased multi-user query and split it into per-user payloads.
+
+        fragments defaults to every fragment of the client's field set.
+        """
+        fragments = fragments or self._fragment_fields
+        fields = frozenset().union(*fragments.values())
+        query = {
+            "query": build_multi_user_query(len(usernames), fields),
+            "variables": {f"u{i}": username for i, username in enumerate(usernames)},
+            "operationName": "MultiUserCompleteData"
+        }
+
+        response = await self._call_api(query, usernames[0])
+        data = response.get('data') if response else None
+        if not data:
+            logger.error(f"Failed to fetch batch data for users: {', '.join(usernames)}")
+            return {}
+
+        roots = {path.split(".")[0] for path in fields}
+        results: Dict[str, Dict[str, Any]] = {}
+        for i, username in enumerate(usernames):
+            if "matchedUser" in roots and not data.get(f"u{i}"):
+                logger.warning(f"No data returned for user: {username}")
+                await self._remember_missing(username, 'not_found')
+                continue
+            user_data = {
+                root: data.get(f"u{i}{suffix}")
+                for root, suffix in USER_ROOT_FIELDS.items() if root in roots
+            }
+            await self._store_fragments(username, user_data, fragments)
+            results[username] = await self._with_global_data(user_data, self._global_fields)
+        return results
+
+    async def get_user_calendar_history(self, username: str,
+                                        current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fetch the submission calendar of every active year and merge it.
+
+        The current year, unless given as current (e.g. the userCalendar of
+        the calendar fragment, which must include activeYears), is fetched
+        first to learn activeYears, then the past years are fetched
+        concurrently under the shared rate limit. Past years can no longer
+        change and are cached almost indefinitely, so after the first call
+        only the current year is refreshed. A past year that cannot be
+        fetched is left out.
+
+        Returns a userCalendar-shaped dict whose submissionCalendar covers all
+        years, or {} if the user was not found.
+        """
+        current_year = datetime.now(timezone.utc).year
+        if current is None:
+            current = await self._get_calendar_year(username, current_year, current_year)
+        if not current:
+            return {}
+
+        past_years = sorted(year for year in current.get("activeYears") or [] if year < current_year)
+        past = await asyncio.gather(
+            *(self._get_calendar_year(username, year, current_year) for year in past_years),
+            return_exceptions=True)
+
+        merged: Dict[str, int] = {}
+        for year, calendar in [*zip(past_years, past), (current_year, current)]:
+            if isinstance(calendar, Exception):
+                logger.warning(f"Leaving {year} out of {username}'s calendar: {str(calendar)}")
+                continue
+            try:
+                days = json.loads(calendar.get("submissionCalendar") or "{}")
+            except (json.JSONDecodeError, AttributeError):
+                logger.warning(f"Invalid submission calendar for {username}")
+                continue
+            for timestamp, count in days.items():
+                merged[timestamp] = max(merged.get(timestamp, 0), int(count))
+
+        return {
+            "activeYears": current.get("activeYears") or [],
+            "streak": current.get("streak", 0),
+            "totalActiveDays": sum(1 for count in merged.values() if count > 0),
+            "submissionCalendar": json.dumps(dict(sorted(merged.items(), key=lambda item: int(item[0]))))
+        }
+
+    async def _get_calendar_year(self, username: str, year: int, current_year: int) -> Dict[str, Any]:
+        """Return one year's userCalendar from cache or the API."""
+        cache_key = f"user_calendar:{username}:{year}"
+        data_type = 'calendar' if year >= current_year else 'calendar_archive'
+        # The miss is counted after the shared tier has been tried
+        cached_data = self._cache.get(cache_key, data_type, record_miss=False)
+        if cached_data:
+            return cached_data
+        await self._cache.load([cache_key])
+        cached_data = self._cache.get(cache_key, data_type)
+        if cached_data:
+            return cached_data
+        return await self._inflight.do(
+            f"{cache_key}:{_upstream_priority.get()}",
+            lambda: self._fetch_calendar_year(username, year, cache_key, data_type))
+
+    async def _fetch_calendar_year(self, username: str, year: int, cache_key: str,
+                                   data_type: str) -> Dict[str, Any]:
+        query = {
+            "query": CALENDAR_QUERY,
+            "variables": {"username": username, "year": year},
+            "operationName": "UserCalendarYear"
+        }
+        response = await self._call_api(query, username)
+        matched_user = ((response or {}).get('data') or {}).get('matchedUser')
+        if not matched_user or not matched_user.get('userCalendar'):
+            logger.error(f"Failed to fetch {year} calendar for {username}")
+            return {}
+        calendar = matched_user['userCalendar']
+        await self._cache.set(cache_key, calendar, data_type)
+        return calendar
+
     async def __aenter__(self):
-        self._session = aiohttp.ClientSession()
+        await self._get_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._session:
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on first use.
+
+        The session (and its keep-alive connection pool) is bound to the event
+        loop it was created on, so a new one is created if the running loop
+        changed since the last call. A client used again after close() also
+        restarts its cache sweeper here.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._session_loop is loop:
+            return self._session
+        self._cache_sweeper.start()
+
+        if self._session is not None and not self._session.closed:
+            logger.warning("Event loop changed, discarding pooled session bound to the previous loop")
+
+        connector = aiohttp.TCPConnector(
+            limit=self._connector_limit,
+            limit_per_host=self._connector_limit_per_host,
+            ttl_dns_cache=self._dns_cache_ttl,
+            keepalive_timeout=self._keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        self._session_loop = loop
+        logger.info("Created pooled HTTP session for LeetCode API")
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pooled session, release its connections and stop the cache sweeper."""
+        if self._session is not None and not self._session.closed:
             await self._session.close()
+        self._session = None
+        self._session_loop = None
+        self._cache_sweeper.stop()
 
     async def login_to_leetcode(self):
         # Open a new tab with the LeetCode login page
@@ -179,96 +852,196 @@ class GQLQuery:
         webbrowser.open('https://leetcode.com/accounts/login/')
 
     async def get_leetcode_session_cookie(self) -> Optional[str]:
-        try:
-            if not self._session:
-                self._session = aiohttp.ClientSession()
-            async with self._session.get('https://leetcode.com') as response:
-                cookies = response.cookies
-                return cookies.get('leetcode_session')
-        except Exception as e:
-            logger.error(f"Failed to get session cookie: {str(e)}")
-            return None
+        credentials = await self._get_credentials()
+        return credentials.session_cookie
 
-    async def _enforce_rate_limit(self):
-        """Enforce rate limiting to prevent IP bans"""
-        current_time = time()
+    async def _get_credentials(self) -> SessionCredentials:
+        """Return the session cookie and CSRF token to send, bootstrapping them once per process"""
+        if self.session_cookie:
+            return SessionCredentials(self.session_cookie)
+        return await self._session_provider.get(self._fetch_session_credentials)
 
-        # Remove timestamps older than the rate limit period
-        self._request_timestamps = [
-            ts for ts in self._request_timestamps
-            if current_time - ts < RATE_LIMIT_PERIOD
-        ]
+    async def _fetch_session_credentials(self) -> SessionCredentials:
+        session = await self._get_session()
+        async with session.get(LEETCODE_URL) as response:
+            cookies = response.cookies
+            session_cookie = cookies.get('LEETCODE_SESSION') or cookies.get('leetcode_session')
+            csrf_token = cookies.get('csrftoken')
+            return SessionCredentials(
+                session_cookie.value if session_cookie else None,
+                csrf_token.value if csrf_token else None
+            )
 
-        # If we've hit the rate limit, wait until we can make another request
-        if len(self._request_timestamps) >= RATE_LIMIT_REQUESTS:
-            wait_time = RATE_LIMIT_PERIOD - \
-                (current_time - self._request_timestamps[0])
-            if wait_time > 0:
-                logger.info(
-                    f"Rate limit reached, waiting {wait_time:.2f} seconds")
-                await sleep(wait_time)
+    @staticmethod
+    def _build_headers(username: str, credentials: SessionCredentials) -> Dict[str, str]:
+        cookies = []
+        if credentials.session_cookie:
+            cookies.append(f"LEETCODE_SESSION={credentials.session_cookie}")
+        if credentials.csrf_token:
+            cookies.append(f"csrftoken={credentials.csrf_token}")
+        headers = {
+            "Content-Type": "application/json",
+            "Referer": f"https://leetcode.com/{username}/" if username else "https://leetcode.com/",
+            "Origin": "https://leetcode.com",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept": "*/*",
+            "Access-Control-Allow-Origin": "*"
+        }
+        if cookies:
+            headers["Cookie"] = "; ".join(cookies)
+        if credentials.csrf_token:
+            headers["x-csrftoken"] = credentials.csrf_token
+        return headers
 
-        # Add small delay between requests
-        await sleep(DELAY_BETWEEN_REQUESTS)
+    async def _enforce_rate_limit(self, priority: int = PRIORITY_INTERACTIVE):
+        """Enforce the adaptive concurrency and rate limits to prevent IP bans.
 
-        # Add current request timestamp
-        self._request_timestamps.append(current_time)
+        Calls are admitted in priority order. Takes a concurrency slot that
+        must be given back with self._limiter.release(priority).
+        """
+        await self._limiter.acquire(priority)
 
     async def _call_api(self, graphql_query: Dict[str, Any], username: str) -> Dict[str, Any]:
-        """Make an async GraphQL API call with rate limiting"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                if not self.session_cookie:
-                    self.session_cookie = await self.get_leetcode_session_cookie()
+        """Make an async GraphQL API call with rate limiting, retries and a deadline.
+
+        429s, 5xx responses, successful responses whose body is not JSON,
+        timeouts and connection errors are retried with jittered exponential
+        backoff (honouring Retry-After) until max_retries or the call deadline
+        is reached, then UpstreamError is raised. Other 4xx responses, JSON or
+        not, are not retried and return an empty dict.
+        """
+        session = await self._get_session()
+        credentials = await self._get_credentials()
+        headers = self._build_headers(username, credentials)
+        logger.debug(f"Query: {json.dumps(graphql_query, indent=2)}")
 
+        priority = _upstream_priority.get()
+        deadline = monotonic() + self._call_deadline
+        attempt = 0
+        auth_refreshed = bool(self.session_cookie)  # A caller-supplied cookie is never refreshed
+        while True:
+            try:
+                self._circuit.before_call()
+            except CircuitOpenError as e:
+                UPSTREAM_CIRCUIT_REJECTIONS.inc()
+                raise UpstreamError(str(e)) from e
+
+            try:
                 # Enforce rate limiting
-                await self._enforce_rate_limit()
+                await asyncio.wait_for(self._enforce_rate_limit(priority), self._remaining(deadline))
+            except asyncio.TimeoutError:
+                self._circuit.release()
+                UPSTREAM_REQUESTS.labels(outcome='deadline_exceeded').inc()
+                raise UpstreamError(f"GraphQL request for {username} timed out waiting for the rate limiter")
+            except BaseException:
+                self._circuit.release()
+                raise
 
-                start_time = time()
-                logger.info(f"Making GraphQL request for user: {username}")
-                logger.debug(f"Query: {json.dumps(graphql_query, indent=2)}")
-
-                headers = {
-                    "Content-Type": "application/json",
-                    "Referer": f"https://leetcode.com/{username}/",
-                    "Origin": "https://leetcode.com",
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                    "Cookie": f"LEETCODE_SESSION={self.session_cookie}",
-                    "Accept": "*/*",
-                    "Access-Control-Allow-Origin": "*"
-                }
+            retry_after: Optional[float] = None
+            try:
+                attempt_timeout = aiohttp.ClientTimeout(total=min(self._attempt_timeout, self._remaining(deadline)))
 
+                start_time = time()
+                logger.info(f"Making GraphQL request for user: {username} (attempt {attempt + 1})")
                 async with session.post(
-                    "https://leetcode.com/graphql",
+                    GRAPHQL_URL,
                     json=graphql_query,
-                    headers=headers
+                    headers=headers,
+                    timeout=attempt_timeout
                 ) as response:
                     elapsed_time = time() - start_time
+                    UPSTREAM_LATENCY.observe(elapsed_time)
                     logger.info(
                         f"Request completed in {elapsed_time:.2f}s with status: {response.status}")
 
-                    response_json = await response.json()
+                    retryable = response.status == 429 or response.status >= 500
+                    response_json, invalid_json = None, False
+                    if not retryable:
+                        try:
+                            response_json = await response.json(content_type=None)
+                        except (ValueError, aiohttp.ContentTypeError):
+                            # An HTML error or challenge page from a proxy instead of GraphQL JSON
+                            invalid_json = True
+                            logger.warning(f"Non-JSON response with status {response.status} for {username}")
 
-                    # Log response status and headers
-                    logger.info(f"Response status: {response.status}")
-                    logger.info(f"Response headers: {dict(response.headers)}")
-                    
-                    if response.ok:
+                    if retryable:
+                        self._limiter.record_overload()
+                        reason = str(response.status)
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        logger.warning(f"Retryable status {response.status} for {username}")
+                    elif invalid_json and response.ok:
+                        reason = 'invalid_json'
+                    else:
+                        self._limiter.record_success(elapsed_time)
+                        self._circuit.record_success()
+                        if response.status in (401, 403) and not auth_refreshed:
+                            # Credentials may have expired; refresh them once and retry
+                            auth_refreshed = True
+                            self._session_provider.invalidate()
+                            refreshed = await self._get_credentials()
+                            if refreshed != credentials:
+                                credentials = refreshed
+                                headers = self._build_headers(username, credentials)
+                                logger.info(f"Retrying request for {username} with refreshed session credentials")
+                                continue
+                        if not response.ok:
+                            UPSTREAM_REQUESTS.labels(outcome='client_error').inc()
+                            logger.error(f"Request failed with status {response.status}")
+                            if not invalid_json:
+                                logger.error(f"Error response: {json.dumps(response_json, indent=2)}")
+                            return {}
+                        UPSTREAM_REQUESTS.labels(outcome='success').inc()
                         if not response_json:
                             logger.error("Empty JSON response received")
                             return {}
-                            
                         logger.debug(f"Response data: {json.dumps(response_json, indent=2)}")
                         if 'errors' in response_json:
                             logger.error(f"GraphQL errors: {json.dumps(response_json['errors'], indent=2)}")
                         return response_json
-                    else:
-                        logger.error(f"Request failed with status {response.status}")
-                        logger.error(f"Error response: {json.dumps(response_json, indent=2)}")
-                        return {}
-        except Exception as e:
-            logger.error(f"API call failed: {str(e)}", exc_info=True)
-            raise
+            except asyncio.TimeoutError:
+                self._limiter.record_overload()
+                reason = 'timeout'
+                logger.warning(f"GraphQL request for {username} timed out")
+            except aiohttp.ClientError as e:
+                self._limiter.record_overload()
+                reason = 'connection'
+                logger.warning(f"GraphQL request for {username} failed: {str(e)}")
+            except BaseException:
+                self._circuit.release()
+                raise
+            finally:
+                self._limiter.release(priority)
+
+            self._circuit.record_failure()
+            attempt += 1
+            if attempt > self._max_retries:
+                UPSTREAM_REQUESTS.labels(outcome='exhausted').inc()
+                raise UpstreamError(f"GraphQL request for {username} failed after {attempt} attempts ({reason})")
+
+            delay = self._backoff(attempt, retry_after)
+            if delay >= self._remaining(deadline):
+                UPSTREAM_REQUESTS.labels(outcome='deadline_exceeded').inc()
+                raise UpstreamError(f"GraphQL request for {username} exceeded its {self._call_deadline}s deadline ({reason})")
+            UPSTREAM_RETRIES.labels(reason=reason).inc()
+            logger.info(f"Retrying request for {username} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _export_limits(concurrency: float, rate: float) -> None:
+        UPSTREAM_CONCURRENCY_LIMIT.set(concurrency)
+        UPSTREAM_RATE_LIMIT.set(rate)
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        return max(deadline - monotonic(), 0.0)
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff; Retry-After, when sent, is a lower bound"""
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
 
     async def get_user_contest_ranking(self, username: str) -> Dict[str, Any]:
         get_user_contest_ranking_json = {
@@ -444,7 +1217,7 @@ class GQLQuery:
                         }
                     """,
             "variables": {"username": username, "year": year},
-            "operationName": "getUserProfile"
+            "operationName": "UserProfileCalendar"
         }
         return await self._call_api(get_user_profile_calendar_json, username)
 
@@ -544,9 +1317,12 @@ class GQLQuery:
         }
         return await self._call_api(user_difficulty_stats_query, username)
 
-    async def get_problems_list(self, categorySlug, limit, filters) -> Dict[str, Any]:
+    async def get_problems_list(self, categorySlug, limit, filters, skip: int = 0) -> Dict[str, Any]:
         """
-        Fetches the list of all available problems from LeetCode.
+        Fetches a page of the list of available problems from LeetCode.
+
+        Args:
+            skip: Number of questions to skip, used to page through the list
 
         Returns:
             Response: HTTP response containing the problems list
@@ -585,7 +1361,7 @@ class GQLQuery:
             "variables": {
                 "categorySlug": categorySlug,
                 "limit": limit,
-                "skip": 0,  # Skip is handled at pagination level
+                "skip": skip,
                 "filters": {
                     "difficulty": filters.get("difficulty"),
                     "status": filters.get("status"),
@@ -1,10 +1,13 @@
 from flask import Flask, render_template, request, jsonify
-from GQLQuery import GQLQuery
+from GQLQuery import GQLQuery, PRIORITY_REFRESH, upstream_priority
+from cache_warmer import ContestRefresher, RefreshAheadWarmer
 from core.analytics import AnalyticsManager
-from data_formatter import format_user_profile
+from data_formatter import format_user_profile, REQUIRED_FIELDS as PROFILE_FIELDS
+from core.utils.async_runner import BackgroundEventLoop
+from core.utils.cache import CacheSweeper, InMemoryCache, register_cache_metrics
+from core.utils.singleflight import SingleFlight
 import json
-import asyncio
-from asgiref.sync import async_to_sync
+import atexit
 import logging
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 import time
@@ -18,6 +21,11 @@ REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method',
 REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['endpoint'])
 ERROR_COUNT = Counter('http_request_errors_total', 'Total HTTP request errors', ['endpoint', 'error_type'])
 
+# Upper bound for a single analysis, kept below the gunicorn worker timeout
+ANALYSIS_TIMEOUT = 50  # seconds
+# Seconds an expired analysis may still be served while it is recomputed
+ANALYSIS_STALE_GRACE = 600
+
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 
 @app.route('/test')
@@ -27,12 +35,48 @@ def test():
 
 try:
     logger.info("Initializing LeetCode API client...")
-    leetcode_api = GQLQuery()
+    # Only request the fields the analyzers and the results template read
+    leetcode_api = GQLQuery(fields=AnalyticsManager.required_fields() + PROFILE_FIELDS)
     logger.info("LeetCode API client initialized successfully")
+    # Re-fetches frequently requested users before their cached data expires
+    cache_warmer = RefreshAheadWarmer(leetcode_api)
+    # Re-fetches cached contest data once each contest's ratings are published
+    contest_refresher = ContestRefresher(leetcode_api)
 except Exception as e:
     logger.error(f"Failed to initialize LeetCode API client: {e}", exc_info=True)
     raise
 
+# Shared event loop that views submit coroutines to, so GQLQuery's connection
+# pool and caches survive between requests
+event_loop = BackgroundEventLoop()
+
+def shutdown_event_loop():
+    """Close the LeetCode API session and stop the shared event loop"""
+    if not event_loop.is_running():
+        return
+    try:
+        event_loop.run(cache_warmer.stop(), timeout=5)
+        event_loop.run(contest_refresher.stop(), timeout=5)
+        event_loop.run(leetcode_api.close(), timeout=5)
+    except Exception as e:
+        logger.error(f"Failed to close LeetCode API client: {e}")
+    finally:
+        event_loop.stop()
+
+atexit.register(shutdown_event_loop)
+
+# Analysis results per user and section set, served stale-while-revalidate
+analysis_cache = InMemoryCache(name='analysis')
+analysis_cache.set_grace('analysis', ANALYSIS_STALE_GRACE)
+analysis_cache_sweeper = CacheSweeper(analysis_cache)
+analysis_cache_sweeper.start()
+
+# Cache hit, miss, eviction and age metrics are recorded by the named caches;
+# this adds their entry counts and sizes to /metrics
+register_cache_metrics(leetcode_api.cache)
+register_cache_metrics(analysis_cache)
+analysis_refreshes = SingleFlight()
+
 def track_request_latency(endpoint):
     """Decorator to track request latency"""
     def decorator(f):
@@ -58,49 +102,98 @@ def track_request_latency(endpoint):
         return wrapped
     return decorator
 
-def analyze_user_data(username):
-    """Helper function to fetch and analyze user data"""
-    async def fetch_and_analyze():
-        try:
-            async with leetcode_api:  # Using context manager to handle session
-                data = await leetcode_api.get_user_complete_data(username)
-                logger.info(f"Raw API response status: {'Success' if data else 'Empty'}")
-                logger.info(f"API response content: {json.dumps(data, indent=2)}")
-                if not data:
-                    return None
-
-                # Initialize analytics manager with the complete data
-                analytics_manager = AnalyticsManager(data)
-                analysis = analytics_manager.generate_complete_analysis()
-
-                return {
-                    "user_data": {
-                        "matchedUser": data.get("matchedUser"),
-                        "userContestRanking": data.get("userContestRanking"),
-                        "allQuestionsCount": data.get("allQuestionsCount")
-                    },
-                    "analysis": analysis
-                }
-        except Exception as e:
-            logger.error(f"Error analyzing data: {e}", exc_info=True)
-            ERROR_COUNT.labels(
-                endpoint='/api/analysis',
-                error_type=type(e).__name__
-            ).inc()
-            # Create analytics manager to get fallback analysis
-            analytics_manager = AnalyticsManager({})
-            return {
-                "user_data": {},
-                "analysis": analytics_manager._generate_fallback_analysis()
-            }
+def parse_sections(value):
+    """Parse a comma separated list of analysis sections, or None if not given"""
+    if not value:
+        return None
+    sections = [section.strip() for section in value.split(',') if section.strip()]
+    unknown = [section for section in sections if section not in AnalyticsManager.SECTION_ANALYZERS]
+    if unknown:
+        raise ValueError(f"Unknown analysis sections: {', '.join(unknown)}")
+    return sections or None
+
+async def fetch_and_analyze(username, sections=None):
+    """Fetch and analyze user data on the running event loop
+
+    When sections is given, only the fields those analyzers need are fetched
+    and only those sections are generated. Results are cached per user and
+    section set; an expired result within the grace window is returned at
+    once while a single background refresh recomputes it.
+    """
+    cache_warmer.ensure_running()
+    contest_refresher.ensure_running()
+    cache_key = f"analysis:{username}:{','.join(sorted(sections)) if sections else 'all'}"
+    cached, stale = analysis_cache.get_with_staleness(cache_key, 'analysis')
+    if cached:
+        if stale:
+            logger.info(f"Serving stale analysis for {username} while it refreshes")
+            analysis_refreshes.start(cache_key, lambda: refresh_analysis(username, sections, cache_key))
+        return cached
+
+    try:
+        result = await analyze(username, sections)
+        if result is not None:
+            analysis_cache.set(cache_key, result, 'analysis')
+        return result
+    except Exception as e:
+        logger.error(f"Error analyzing data: {e}", exc_info=True)
+        ERROR_COUNT.labels(
+            endpoint='/api/analysis',
+            error_type=type(e).__name__
+        ).inc()
+        # Create analytics manager to get fallback analysis
+        analytics_manager = AnalyticsManager({})
+        return {
+            "user_data": {},
+            "analysis": analytics_manager._generate_fallback_analysis()
+        }
 
+async def refresh_analysis(username, sections, cache_key):
+    """Recompute a stale cached analysis from fresh user data; failures keep the stale result"""
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(fetch_and_analyze())
-        finally:
-            loop.close()
+        with upstream_priority(PRIORITY_REFRESH):
+            result = await analyze(username, sections, allow_stale=False)
+        if result is not None:
+            analysis_cache.set(cache_key, result, 'analysis')
+    except Exception as e:
+        logger.warning(f"Background analysis refresh for {username} failed: {e}")
+
+async def analyze(username, sections=None, allow_stale=True):
+    """Fetch user data and generate the analysis, or None if the user has no data"""
+    fields = AnalyticsManager.required_fields(sections) if sections else None
+    data = await leetcode_api.get_user_complete_data(username, fields=fields, allow_stale=allow_stale)
+    logger.info(f"Raw API response status: {'Success' if data else 'Empty'}")
+    logger.info(f"API response content: {json.dumps(data, indent=2)}")
+    if not data:
+        return None
+
+    # The calendar fragment only covers the current year; merge in the past active years
+    calendar = (data.get("matchedUser") or {}).get("userCalendar")
+    if calendar:
+        history = await leetcode_api.get_user_calendar_history(username, calendar)
+        if history:
+            data = {**data, "matchedUser": {**data["matchedUser"], "userCalendar": {**calendar, **history}}}
+
+    # Initialize analytics manager with the complete data
+    analytics_manager = AnalyticsManager(data)
+    if sections:
+        analysis = analytics_manager.generate_section_analysis(sections)
+    else:
+        analysis = analytics_manager.generate_complete_analysis()
+
+    return {
+        "user_data": {
+            "matchedUser": data.get("matchedUser"),
+            "userContestRanking": data.get("userContestRanking"),
+            "allQuestionsCount": data.get("allQuestionsCount")
+        },
+        "analysis": analysis
+    }
+
+def analyze_user_data(username, sections=None):
+    """Helper function to fetch and analyze user data"""
+    try:
+        return event_loop.run(fetch_and_analyze(username, sections), timeout=ANALYSIS_TIMEOUT)
     except Exception as e:
         logger.error(f"Event loop error: {e}", exc_info=True)
         ERROR_COUNT.labels(
@@ -114,6 +207,39 @@ def analyze_user_data(username):
             "analysis": analytics_manager._generate_fallback_analysis()
         }
 
+def render_analysis(username, result):
+    """Render the results page for an analysis result, or the index page with an error"""
+    if result is None:
+        logger.error(f"Failed to fetch/analyze data for user: {username}")
+        return render_template('index.html', 
+            error="Failed to analyze user data. Please check the username and try again.")
+    
+    user_data = result["user_data"]
+    analysis = result["analysis"]
+    
+    # Format base profile data
+    formatted_data = format_user_profile(user_data)
+    if formatted_data is None:
+        logger.error(f"Failed to format data for user: {username}")
+        return render_template('index.html',
+            error="Failed to process user data. Please try again later.")
+    
+    # Log profile picture URL
+    logger.info(f"Profile picture URL: {formatted_data.get('profile', {}).get('userAvatar')}")
+    
+    # Convert analysis to dict to ensure proper JSON serialization
+    analysis_dict = json.loads(json.dumps(analysis))
+    logger.info(f"Username: {username}")
+    logger.info(f"Raw Stats data being passed to template: {json.dumps(formatted_data, indent=2)}")
+    logger.info(f"Raw Analysis data being passed to template: {json.dumps(analysis_dict, indent=2)}")
+    
+    rendered = render_template('results.html',
+                            username=username,
+                            stats=formatted_data,
+                            analysis=analysis_dict)
+    logger.info("Template rendered successfully")
+    return rendered
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for Kubernetes probes"""
@@ -144,46 +270,23 @@ def index():
         
         # Get and analyze user data
         result = analyze_user_data(username)
-        
-        if result is None:
-            logger.error(f"Failed to fetch/analyze data for user: {username}")
-            return render_template('index.html', 
-                error="Failed to analyze user data. Please check the username and try again.")
-        
-        user_data = result["user_data"]
-        analysis = result["analysis"]
-        
-        # Format base profile data
-        formatted_data = format_user_profile(user_data)
-        if formatted_data is None:
-            logger.error(f"Failed to format data for user: {username}")
-            return render_template('index.html',
-                error="Failed to process user data. Please try again later.")
-        
-        # Log profile picture URL
-        logger.info(f"Profile picture URL: {formatted_data.get('profile', {}).get('userAvatar')}")
-        
-        # Convert analysis to dict to ensure proper JSON serialization
-        analysis_dict = json.loads(json.dumps(analysis))
-        logger.info(f"Username: {username}")
-        logger.info(f"Username: {username}")
-        logger.info(f"Raw Stats data being passed to template: {json.dumps(formatted_data, indent=2)}")
-        logger.info(f"Raw Analysis data being passed to template: {json.dumps(analysis_dict, indent=2)}")
-        
-        rendered = render_template('results.html',
-                                username=username,
-                                stats=formatted_data,
-                                analysis=analysis_dict)
-        logger.info("Template rendered successfully")
-        return rendered
+        return render_analysis(username, result)
     
     return render_template('index.html')
 
 @app.route('/api/analysis/<username>')
 @track_request_latency('api_analysis')
 def get_analysis(username):
-    """API endpoint to get just the analysis"""
-    result = analyze_user_data(username)
+    """API endpoint to get just the analysis
+
+    Pass ?sections=coding_patterns,skill_assessment,learning_path to fetch and
+    generate only those sections.
+    """
+    try:
+        sections = parse_sections(request.args.get('sections'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = analyze_user_data(username, sections)
     if result is None:
         return jsonify({"error": "Failed to analyze user data"}), 400
     return jsonify(result["analysis"])
@@ -0,0 +1,221 @@
+"""
+ASGI entry point for the LeetCode analysis API.
+
+The analysis, index, health and metrics routes are served natively async,
+awaiting GQLQuery directly on the server's event loop, so a single worker can
+hold many upstream LeetCode fetches in flight. Every other path (static files,
+/test) is delegated to the Flask app through asgiref's WSGI adapter.
+
+Run with uvicorn workers from inside api/, e.g.:
+
+    gunicorn --chdir api asgi:app -k uvicorn.workers.UvicornWorker --workers 4
+
+The modules here import each other by top-level name (app, GQLQuery, core),
+and the repository root has its own app.py and core/, so api/ must come
+first on sys.path; --chdir (or uvicorn's --app-dir api) puts it there.
+"""
+
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app import (
+    app as flask_app,
+    leetcode_api,
+    cache_warmer,
+    contest_refresher,
+    fetch_and_analyze,
+    parse_sections,
+    render_analysis,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    ERROR_COUNT,
+)
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PREFIX = '/api/analysis/'
+MAX_FORM_BODY = 64 * 1024  # bytes
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+
+async def send_response(send: Send, status: int, body: bytes, content_type: str) -> None:
+    """Send a complete HTTP response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send: Send, status: int, payload: Any) -> None:
+    await send_response(send, status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+
+async def send_html(send: Send, status: int, html: str) -> None:
+    await send_response(send, status, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+
+async def read_body(receive: Receive, limit: int = MAX_FORM_BODY) -> bytes:
+    """Read the request body, stopping at limit bytes"""
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise ValueError("Request body too large")
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def wsgi_environ(scope: Scope) -> Dict[str, Any]:
+    """Build the minimal WSGI environ Flask needs to render templates (url_for)"""
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    server = scope.get('server') or ('localhost', 80)
+    return {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'HTTP_HOST': headers.get('host', f"{server[0]}:{server[1]}"),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+    }
+
+
+def render(scope: Scope, renderer: Callable[..., str], *args: Any, **kwargs: Any) -> str:
+    """Run a Flask template renderer inside a request context built from the ASGI scope"""
+    with flask_app.request_context(wsgi_environ(scope)):
+        return renderer(*args, **kwargs)
+
+
+async def index(scope: Scope, receive: Receive, send: Send) -> int:
+    if scope['method'] == 'GET':
+        await send_html(send, 200, render(scope, render_template, 'index.html'))
+        return 200
+    if scope['method'] != 'POST':
+        await send_response(send, 405, b'Method Not Allowed', 'text/plain')
+        return 405
+
+    try:
+        form = parse_qs((await read_body(receive)).decode('utf-8'))
+    except ValueError as e:
+        await send_response(send, 400, str(e).encode('utf-8'), 'text/plain')
+        return 400
+    username = form.get('username', [''])[0].strip()
+    if not username:
+        await send_response(send, 400, b'Missing username', 'text/plain')
+        return 400
+
+    logger.info(f"Processing request for username: {username}")
+    result = await fetch_and_analyze(username)
+    await send_html(send, 200, render(scope, render_analysis, username, result))
+    return 200
+
+
+async def get_analysis(scope: Scope, receive: Receive, send: Send, username: str) -> int:
+    """API endpoint to get just the analysis"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        sections = parse_sections(query.get('sections', [''])[0])
+    except ValueError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return 400
+    result = await fetch_and_analyze(username, sections)
+    if result is None:
+        await send_json(send, 400, {"error": "Failed to analyze user data"})
+        return 400
+    await send_json(send, 200, result["analysis"])
+    return 200
+
+
+async def health_check(scope: Scope, receive: Receive, send: Send) -> int:
+    """Health check endpoint for Kubernetes probes"""
+    await send_json(send, 200, {"status": "healthy", "timestamp": time.time()})
+    return 200
+
+
+async def metrics(scope: Scope, receive: Receive, send: Send) -> int:
+    """Endpoint for Prometheus metrics"""
+    await send_response(send, 200, generate_latest(), CONTENT_TYPE_LATEST)
+    return 200
+
+
+async def tracked(endpoint: str, scope: Scope, handler: Callable[..., Awaitable[int]], *args: Any) -> None:
+    """Run a handler while recording the same request metrics as the Flask views"""
+    start_time = time.time()
+    try:
+        status = await handler(scope, *args)
+        REQUEST_COUNT.labels(method=scope['method'], endpoint=endpoint, status=status).inc()
+    except Exception as e:
+        ERROR_COUNT.labels(endpoint=endpoint, error_type=type(e).__name__).inc()
+        raise
+    finally:
+        REQUEST_LATENCY.labels(endpoint=endpoint).observe(time.time() - start_time)
+
+
+def route(path: str) -> Tuple[Optional[str], Optional[Callable[..., Awaitable[int]]], Tuple[str, ...]]:
+    """Return (metrics endpoint, handler, path args) for natively served paths"""
+    if path == '/':
+        return 'index', index, ()
+    if path.startswith(ANALYSIS_PREFIX):
+        username = path[len(ANALYSIS_PREFIX):]
+        if username and '/' not in username:
+            return 'api_analysis', get_analysis, (username,)
+    if path == '/health':
+        return None, health_check, ()
+    if path == '/metrics':
+        return None, metrics, ()
+    return None, None, ()
+
+
+async def lifespan(scope: Scope, receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await cache_warmer.stop()
+            await contest_refresher.stop()
+            await leetcode_api.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    endpoint, handler, args = route(scope['path'])
+    if handler is None:
+        await wsgi_fallback(scope, receive, send)
+    elif endpoint is None:
+        await handler(scope, receive, send, *args)
+    else:
+        await tracked(endpoint, scope, handler, receive, send, *args)
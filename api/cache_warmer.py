@@ -0,0 +1,232 @@
+"""
+Background refreshing of cached user data.
+
+A small set of usernames gets most of the traffic. RefreshAheadWarmer counts
+lookups of each user's complete data with an exponentially decaying score,
+and every check interval re-fetches the fragments of the hottest users that
+are missing or expire within the refresh-ahead window, batched through the
+aliased multi-user query. Fragments with longer TTLs (profile details,
+contest data) are left alone until they are due themselves. Hot profiles are
+then refreshed before they expire instead of turning into a cache miss.
+
+The warmer draws from its own token bucket sized to a share of the upstream
+rate budget, on top of the shared limiter; with Redis the bucket is shared by
+every worker, so the share holds for the whole cluster. Its calls run in the
+refresh priority class, so interactive requests always keep the rest of the
+budget and go first. Users that another worker already refreshed are picked
+up from the shared cache tier instead of being fetched again.
+
+ContestRefresher re-fetches the contest data of every user with cached
+contest data right after each contest's ratings are published. Every worker
+wakes for the same update, so each waits a random delay and then skips users
+whose contest data a peer already refreshed into the shared tier.
+"""
+
+import asyncio
+import logging
+import math
+import random
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from GQLQuery import (
+    GQLQuery,
+    BATCH_CHUNK_SIZE,
+    CONTEST_FRAGMENTS,
+    PRIORITY_BULK,
+    PRIORITY_REFRESH,
+    RATE_LIMIT_PERIOD,
+    RATE_LIMIT_REQUESTS,
+    upstream_priority,
+)
+from core.utils.contest_schedule import next_contest_update
+from core.utils.rate_limiter import create_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+WARMER_CHECK_INTERVAL = 30    # Seconds between refresh checks
+WARMER_REFRESH_AHEAD = 120    # Refresh entries expiring within this many seconds
+WARMER_HALF_LIFE = 3600       # Seconds for the weight of a lookup to halve
+WARMER_MIN_SCORE = 3.0        # Decayed lookups needed for a user to count as hot
+WARMER_MAX_HOT_USERS = 300    # Most users kept warm
+WARMER_MAX_TRACKED = 10000    # Most users whose scores are tracked
+WARMER_RATE_SHARE = 0.2       # Share of the upstream rate budget the warmer may use
+WARMER_BUDGET_KEY = "leetcode:ratelimit:warmer"  # Redis key of the warmer's cluster-wide bucket
+CONTEST_REFRESH_JITTER = 300  # Most seconds past a contest update a worker waits before refreshing
+
+
+class BackgroundRefresher(ABC):
+    """A refresh loop run as a task on whichever event loop serves requests."""
+
+    _task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def run(self) -> None:
+        """Run the refresh loop until cancelled."""
+
+    def ensure_running(self) -> None:
+        """Start the loop on the running event loop unless it already runs there."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            logger.info(f"Starting {type(self).__name__}")
+            self._task = loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+class RefreshAheadWarmer(BackgroundRefresher):
+    """Keeps frequently looked-up users' complete data cached."""
+
+    def __init__(self, client: GQLQuery,
+                 check_interval: float = WARMER_CHECK_INTERVAL,
+                 refresh_ahead: float = WARMER_REFRESH_AHEAD,
+                 half_life: float = WARMER_HALF_LIFE,
+                 min_score: float = WARMER_MIN_SCORE,
+                 max_hot_users: int = WARMER_MAX_HOT_USERS,
+                 max_tracked: int = WARMER_MAX_TRACKED,
+                 rate_share: float = WARMER_RATE_SHARE,
+                 chunk_size: int = BATCH_CHUNK_SIZE) -> None:
+        if not 0 < rate_share <= 1:
+            raise ValueError("Rate share must be in (0, 1]")
+        self.client = client
+        self.check_interval = check_interval
+        self.refresh_ahead = refresh_ahead
+        self.min_score = min_score
+        self.max_hot_users = max_hot_users
+        self.max_tracked = max_tracked
+        self.chunk_size = chunk_size
+        self._decay = math.log(2) / half_life
+        self._scores: Dict[str, Tuple[float, float]] = {}  # username -> (score, updated at)
+        # One token per batched query, so the warmers together never exceed their share
+        self._budget = create_rate_limiter(RATE_LIMIT_REQUESTS / RATE_LIMIT_PERIOD * rate_share, 1,
+                                           client.redis, WARMER_BUDGET_KEY)
+        client.access_listener = self.record
+
+    def record(self, username: str) -> None:
+        """Count one lookup of username."""
+        now = monotonic()
+        self._scores[username] = (self._score(username, now) + 1, now)
+        if len(self._scores) > self.max_tracked:
+            self._prune(now)
+
+    def hot_users(self) -> List[str]:
+        """Return the hottest users at or above min_score, hottest first."""
+        now = monotonic()
+        scored = [(self._score(username, now), username) for username in self._scores]
+        hot = sorted((item for item in scored if item[0] >= self.min_score), reverse=True)
+        return [username for _, username in hot[:self.max_hot_users]]
+
+    def due_users(self) -> Dict[str, List[str]]:
+        """Map hot users to their fragments that are missing or expire within refresh_ahead."""
+        due = {}
+        for username in self.hot_users():
+            if self.client.is_known_missing(username):
+                continue
+            fragments = self.client.due_fragments(username, self.refresh_ahead)
+            if fragments:
+                due[username] = fragments
+        return due
+
+    async def run_once(self) -> int:
+        """Refresh every due user; return how many were refreshed."""
+        due = self.due_users()
+        if not due:
+            return 0
+        # Hot users are hot on every worker; skip those another worker already refreshed
+        if await self.client.load_shared_user_data(due, self.refresh_ahead):
+            due = self.due_users()
+            if not due:
+                return 0
+        logger.info(f"Refreshing {len(due)} hot users ahead of expiry")
+        # One batched query selects the same fragments for every user in it
+        by_fragments: Dict[Tuple[str, ...], List[str]] = {}
+        for username, fragments in due.items():
+            by_fragments.setdefault(tuple(sorted(fragments)), []).append(username)
+        refreshed = 0
+        for fragments, usernames in by_fragments.items():
+            for i in range(0, len(usernames), self.chunk_size):
+                await self._budget.acquire()
+                try:
+                    with upstream_priority(PRIORITY_REFRESH):
+                        refreshed += await self.client.refresh_users_complete_data(
+                            usernames[i:i + self.chunk_size], self.chunk_size, fragments)
+                except Exception as e:
+                    logger.warning(f"Refresh-ahead batch failed: {str(e)}")
+        return refreshed
+
+    async def run(self) -> None:
+        """Check for due users every check_interval until cancelled."""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Refresh-ahead check failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.check_interval)
+
+    def _score(self, username: str, now: float) -> float:
+        score, updated = self._scores.get(username, (0.0, now))
+        return score * math.exp(-self._decay * (now - updated))
+
+    def _prune(self, now: float) -> None:
+        """Drop the coldest half of the tracked users."""
+        ranked = sorted(self._scores, key=lambda username: self._score(username, now))
+        for username in ranked[:len(ranked) // 2]:
+            del self._scores[username]
+
+
+class ContestRefresher(BackgroundRefresher):
+    """Refreshes the contest data of every tracked user once a contest's ratings are out.
+
+    Contest fragments are cached until the next contest update (see
+    contest_schedule), so they all expire together; this re-fetches them in
+    batched bulk-priority queries right after that moment.
+    """
+
+    def __init__(self, client: GQLQuery, chunk_size: int = BATCH_CHUNK_SIZE,
+                 jitter: float = CONTEST_REFRESH_JITTER) -> None:
+        self.client = client
+        self.chunk_size = chunk_size
+        self.jitter = jitter
+
+    def due_users(self) -> List[str]:
+        """Return the tracked users with contest data that is missing or expired."""
+        return [username for username in self.client.contest_users()
+                if any(fragment in CONTEST_FRAGMENTS for fragment in self.client.due_fragments(username, 0))]
+
+    async def run_once(self) -> int:
+        """Refresh the contest data of tracked users not refreshed elsewhere; return how many were refreshed."""
+        usernames = self.client.contest_users()
+        if not usernames:
+            return 0
+        # Workers track overlapping users; take what a peer already refreshed
+        await self.client.load_shared_user_data(usernames)
+        due = self.due_users()
+        if not due:
+            return 0
+        logger.info(f"Refreshing contest data of {len(due)} users")
+        with upstream_priority(PRIORITY_BULK):
+            return await self.client.refresh_contest_data(due, self.chunk_size)
+
+    async def run(self) -> None:
+        """Sleep until each contest update plus a random delay, then refresh, until cancelled."""
+        while True:
+            now = datetime.now(timezone.utc)
+            update = next_contest_update(now)
+            logger.info(f"Next contest data refresh at {update.isoformat()}")
+            # Spread the workers out so later ones find earlier ones' results
+            await asyncio.sleep((update - now).total_seconds() + 1 + random.uniform(0, self.jitter))
+            try:
+                refreshed = await self.run_once()
+                logger.info(f"Refreshed contest data of {refreshed} users")
+            except Exception as e:
+                logger.error(f"Contest data refresh failed: {str(e)}", exc_info=True)
@@ -0,0 +1,207 @@
+"""
+Local mirror of the LeetCode problem catalog.
+
+The first sync pages through problemsetQuestionList and stores every question
+in a JSON file. Later syncs fetch only the pages holding questions added since
+the last run, plus a small rotating window of existing pages to pick up
+changed questions, so the whole catalog is never refetched per request.
+
+Run a sync manually or from a scheduler:
+
+    python catalog_sync.py [--full]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from GQLQuery import GQLQuery, PRIORITY_BULK, upstream_priority
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'problem_catalog.json')
+CATALOG_PAGE_SIZE = 100     # Questions per problemsetQuestionList request
+CATALOG_CONCURRENCY = 4     # Pages fetched in parallel (still subject to the rate limiter)
+CATALOG_REFRESH_PAGES = 5   # Existing pages re-checked for changes per incremental sync
+
+# Question fields that are the same for every user; status, isFavor and freqBar are not
+CATALOG_FIELDS = (
+    "questionFrontendId", "title", "titleSlug", "difficulty", "acRate",
+    "isPaidOnly", "topicTags", "hasSolution", "hasVideoSolution"
+)
+# Fields whose change counts as a changed question (acRate drifts constantly)
+FINGERPRINT_FIELDS = ("title", "difficulty", "isPaidOnly", "topicTags", "hasSolution", "hasVideoSolution")
+
+
+class ProblemCatalogStore:
+    """Problem catalog persisted as a JSON file and keyed by titleSlug."""
+
+    def __init__(self, path: str = CATALOG_PATH) -> None:
+        self.path = path
+        self.total = 0
+        self.synced_at: Optional[float] = None
+        self.refresh_cursor = 0
+        self._questions: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def load(self) -> None:
+        """Load the catalog from disk; a missing file leaves it empty."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self.total = data.get("total", 0)
+        self.synced_at = data.get("synced_at")
+        self.refresh_cursor = data.get("refresh_cursor", 0)
+        self._questions = {q["titleSlug"]: q for q in data.get("questions", [])}
+
+    def save(self) -> None:
+        """Write the catalog atomically so readers never see a partial file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "total": self.total,
+                "synced_at": self.synced_at,
+                "refresh_cursor": self.refresh_cursor,
+                "questions": self.questions()
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def upsert(self, question: Dict[str, Any]) -> str:
+        """Insert or update a question; return 'new', 'changed' or 'unchanged'."""
+        record = {field: question.get(field) for field in CATALOG_FIELDS}
+        existing = self._questions.get(record["titleSlug"])
+        self._questions[record["titleSlug"]] = record
+        if existing is None:
+            return 'new'
+        if any(existing.get(field) != record[field] for field in FINGERPRINT_FIELDS):
+            return 'changed'
+        return 'unchanged'
+
+    def questions(self) -> List[Dict[str, Any]]:
+        """Return all questions ordered by frontend id."""
+        return sorted(self._questions.values(), key=lambda q: _frontend_id(q))
+
+    def topic_totals(self) -> Dict[str, Dict[str, int]]:
+        """Return the number of questions per topic, split by difficulty."""
+        totals: Dict[str, Dict[str, int]] = {}
+        for question in self._questions.values():
+            for tag in question.get("topicTags") or []:
+                counts = totals.setdefault(tag["name"], {"All": 0, "Easy": 0, "Medium": 0, "Hard": 0})
+                counts["All"] += 1
+                if question.get("difficulty") in counts:
+                    counts[question["difficulty"]] += 1
+        return totals
+
+
+class ProblemCatalogSync:
+    """Pages through problemsetQuestionList and keeps a ProblemCatalogStore current."""
+
+    def __init__(self, client: GQLQuery, store: ProblemCatalogStore,
+                 page_size: int = CATALOG_PAGE_SIZE,
+                 concurrency: int = CATALOG_CONCURRENCY,
+                 refresh_pages: int = CATALOG_REFRESH_PAGES) -> None:
+        if page_size <= 0 or concurrency <= 0:
+            raise ValueError("Page size and concurrency must be positive")
+        self.client = client
+        self.store = store
+        self.page_size = page_size
+        self.refresh_pages = refresh_pages
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def sync(self, full: bool = False) -> Dict[str, int]:
+        """Sync the catalog and return counts of new, changed and unchanged questions.
+
+        Questions are listed in frontend id order, so new questions appear on
+        the pages past the stored count. A full sync runs when the store is
+        empty, when full is set, or when the upstream total shrank.
+        """
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "pages": 0, "failed_pages": 0}
+        total, first_page = await self._fetch_page(0)
+        if total is None:
+            raise RuntimeError("Failed to fetch the first page of the problem catalog")
+
+        stored = len(self.store)
+        page_count = -(-total // self.page_size)
+        if full or stored == 0 or total < stored:
+            logger.info(f"Running full catalog sync of {total} questions")
+            skips = [page * self.page_size for page in range(1, page_count)]
+        else:
+            new_skips = list(range((stored // self.page_size) * self.page_size, total, self.page_size))
+            refresh_skips = self._refresh_window(stored, exclude=set(new_skips) | {0})
+            skips = sorted(set(new_skips) | set(refresh_skips))
+            logger.info(f"Running incremental catalog sync: {total - stored} new questions, "
+                        f"{len(refresh_skips)} pages re-checked")
+
+        pages = [(total, first_page)] + list(await asyncio.gather(*(self._fetch_page(skip) for skip in skips)))
+        for page_total, questions in pages:
+            if page_total is None:
+                stats["failed_pages"] += 1
+                continue
+            stats["pages"] += 1
+            for question in questions:
+                stats[self.store.upsert(question)] += 1
+
+        self.store.total = total
+        self.store.synced_at = time.time()
+        self.store.save()
+        logger.info(f"Catalog sync finished: {stats}")
+        return stats
+
+    def _refresh_window(self, stored: int, exclude: set) -> List[int]:
+        """Return the next rotating window of existing pages to re-check for changes."""
+        stored_pages = -(-stored // self.page_size)
+        skips: List[int] = []
+        for _ in range(min(self.refresh_pages, stored_pages)):
+            page = self.store.refresh_cursor % stored_pages
+            self.store.refresh_cursor = page + 1
+            if page * self.page_size not in exclude:
+                skips.append(page * self.page_size)
+        return skips
+
+    async def _fetch_page(self, skip: int) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+        """Fetch one page at bulk priority; returns (None, []) if it failed."""
+        async with self._semaphore:
+            try:
+                with upstream_priority(PRIORITY_BULK):
+                    response = await self.client.get_problems_list("", self.page_size, {}, skip=skip)
+            except Exception as e:
+                logger.error(f"Failed to fetch catalog page at skip={skip}: {e}")
+                return None, []
+        question_list = ((response or {}).get("data") or {}).get("problemsetQuestionList")
+        if not question_list:
+            logger.error(f"Empty catalog page at skip={skip}")
+            return None, []
+        return question_list.get("total"), question_list.get("questions") or []
+
+
+def _frontend_id(question: Dict[str, Any]) -> Tuple[int, str]:
+    frontend_id = str(question.get("questionFrontendId") or "")
+    return (int(frontend_id), "") if frontend_id.isdigit() else (1 << 31, frontend_id)
+
+
+async def run_sync(full: bool = False, path: str = CATALOG_PATH) -> Dict[str, int]:
+    store = ProblemCatalogStore(path)
+    store.load()
+    client = GQLQuery()
+    try:
+        return await ProblemCatalogSync(client, store).sync(full=full)
+    finally:
+        await client.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Sync the local LeetCode problem catalog mirror")
+    parser.add_argument('--full', action='store_true', help='refetch every page')
+    parser.add_argument('--path', default=CATALOG_PATH, help='catalog file path')
+    args = parser.parse_args()
+    print(asyncio.run(run_sync(full=args.full, path=args.path)))
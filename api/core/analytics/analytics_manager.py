@@ -8,6 +8,13 @@ from .learning_path_analyzer import LearningPathAnalyzer
 logger = logging.getLogger(__name__)
 
 class AnalyticsManager:
+    # Analysis sections and the analyzer producing each one
+    SECTION_ANALYZERS = {
+        "coding_patterns": PatternAnalyzer,
+        "skill_assessment": SkillAnalyzer,
+        "learning_path": LearningPathAnalyzer
+    }
+
     def __init__(self, user_data: Dict[str, Any]):
         """Initialize the analytics manager with user data."""
         self.user_data = user_data
@@ -53,6 +60,44 @@ class AnalyticsManager:
             logger.error(f"Error generating complete analysis: {str(e)}", exc_info=True)
             return self._generate_fallback_analysis()
 
+    @classmethod
+    def required_fields(cls, sections: Optional[List[str]] = None) -> List[str]:
+        """Return the user data fields needed for the given sections (all by default)."""
+        sections = sections or list(cls.SECTION_ANALYZERS)
+        unknown = [section for section in sections if section not in cls.SECTION_ANALYZERS]
+        if unknown:
+            raise ValueError(f"Unknown analysis sections: {', '.join(unknown)}")
+
+        fields: List[str] = []
+        for section in sections:
+            for field in cls.SECTION_ANALYZERS[section].REQUIRED_FIELDS:
+                if field not in fields:
+                    fields.append(field)
+        return fields
+
+    def generate_section_analysis(self, sections: List[str]) -> Dict[str, Any]:
+        """Generate only the requested analysis sections."""
+        generators = {
+            "coding_patterns": self.pattern_analyzer.get_complete_analysis,
+            "skill_assessment": self.skill_analyzer.get_complete_skill_analysis,
+            "learning_path": self.learning_path_analyzer.generate_learning_path
+        }
+        try:
+            logger.info(f"Generating analysis sections: {', '.join(sections)}")
+            return {
+                "detailed_analysis": {section: generators[section]() for section in sections},
+                "analysis_timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Error generating section analysis: {str(e)}", exc_info=True)
+            fallback = self._generate_fallback_analysis()
+            return {
+                "detailed_analysis": {
+                    section: fallback["detailed_analysis"].get(section, {}) for section in sections
+                },
+                "analysis_timestamp": fallback["analysis_timestamp"]
+            }
+
     def _compile_analysis(
         self,
         pattern_analysis: Dict[str, Any],
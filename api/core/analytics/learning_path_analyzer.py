@@ -3,6 +3,14 @@ from datetime import datetime, timedelta
 import json
 
 class LearningPathAnalyzer:
+    # User data fields this analyzer reads (dotted paths, see GQLQuery.USER_DATA_FIELDS)
+    REQUIRED_FIELDS = [
+        "matchedUser.submitStats.acSubmissionNum.{difficulty,count}",
+        "matchedUser.tagProblemCounts.{advanced,intermediate}.{tagName,problemsSolved}",
+        # activeYears lets the calendar of every active year be merged in
+        "matchedUser.userCalendar.{activeYears,submissionCalendar}",
+    ]
+
     def __init__(self, user_data: Dict[str, Any]):
         self.user_data = user_data
         self.matched_user = user_data.get("matchedUser", {})
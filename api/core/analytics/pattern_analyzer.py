@@ -3,6 +3,14 @@ from datetime import datetime
 import json
 
 class PatternAnalyzer:
+    # User data fields this analyzer reads (dotted paths, see GQLQuery.USER_DATA_FIELDS)
+    REQUIRED_FIELDS = [
+        "matchedUser.submitStats.{acSubmissionNum,totalSubmissionNum}.count",
+        "matchedUser.tagProblemCounts.{advanced,intermediate,fundamental}.{tagName,problemsSolved}",
+        # activeYears lets the calendar of every active year be merged in
+        "matchedUser.userCalendar.{activeYears,streak,totalActiveDays,submissionCalendar}",
+    ]
+
     def __init__(self, user_data: Dict[str, Any]):
         self.user_data = user_data
         self.matched_user = user_data.get("matchedUser", {})
@@ -2,6 +2,16 @@ from typing import Dict, Any, List
 from datetime import datetime
 
 class SkillAnalyzer:
+    # User data fields this analyzer reads (dotted paths, see GQLQuery.USER_DATA_FIELDS)
+    REQUIRED_FIELDS = [
+        "matchedUser.submitStats.acSubmissionNum.{difficulty,count,submissions}",
+        "matchedUser.tagProblemCounts.{advanced,intermediate,fundamental}.{tagName,problemsSolved}",
+        "matchedUser.problemsSolvedBeatsStats.{difficulty,percentage}",
+        "userContestRanking.{rating,attendedContestsCount,globalRanking,topPercentage}",
+        "userContestRankingHistory.rating",
+        "userContestRankingHistory.contest.startTime",
+    ]
+
     def __init__(self, user_data: Dict[str, Any]):
         self.user_data = user_data
         self.matched_user = user_data.get("matchedUser", {})
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import logging
+import random
+from itertools import count
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDLimiter:
+    """Adaptive concurrency and rate limits using additive increase, multiplicative decrease.
+
+    Every healthy response raises the concurrency limit by 1/limit and the
+    request rate by rate_increase/limit, i.e. about +1 and +rate_increase per
+    window of responses. A 429, a server error, a timeout or a latency spike
+    (latency above spike_factor times the moving average) multiplies both by
+    decrease_factor, at most once per cooldown so that one burst of failures
+    counts as a single signal.
+
+    The rate lives in the token bucket: increases and cuts go through its
+    increase_rate and decrease_rate methods, and rate is read back from it.
+    A bucket shared through Redis thereby adapts one rate for the whole
+    cluster, and a cut there is applied at most once per cooldown however
+    many processes saw the overload.
+    Calls are admitted by priority (0 is most urgent); slot_shares caps the
+    share of the concurrency limit a priority class may hold.
+    on_change is called with (concurrency limit, rate) after every change.
+    """
+
+    def __init__(self, rate_limiter, initial_rate: float, min_rate: float, max_rate: float,
+                 initial_concurrency: float, min_concurrency: float, max_concurrency: float,
+                 rate_increase: float = 0.05, decrease_factor: float = 0.5,
+                 spike_factor: float = 2.0, cooldown: float = 5.0,
+                 slot_shares: Optional[Dict[int, float]] = None,
+                 on_change: Optional[Callable[[float, float], None]] = None) -> None:
+        if not 0 < min_rate <= initial_rate <= max_rate:
+            raise ValueError("Rates must satisfy 0 < min_rate <= initial_rate <= max_rate")
+        if not 1 <= min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError("Concurrency must satisfy 1 <= min <= initial <= max")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("Decrease factor must be between 0 and 1")
+        self._rate_limiter = rate_limiter
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.rate_increase = rate_increase
+        self.decrease_factor = decrease_factor
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self._on_change = on_change
+        self.rate = initial_rate
+        self.limit = initial_concurrency
+        self._latency_avg: Optional[float] = None
+        self._last_decrease = 0.0
+        self._slot_shares = dict(slot_shares or {})
+        self._in_flight = 0
+        self._in_flight_by: Dict[int, int] = {}
+        self._queue: List[Tuple[int, int]] = []  # Heap of (priority, arrival) waiting to be admitted
+        self._sequence = count()
+        self._listeners: List[asyncio.Future] = []
+        self._rate_limiter.set_rate(initial_rate)
+        self._apply()
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(self.limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def allowed(self, priority: int) -> int:
+        """Return the number of calls of a priority class that may be in flight at once."""
+        return max(1, int(self.concurrency * self._slot_shares.get(priority, 1.0)))
+
+    async def acquire(self, priority: int = 0) -> None:
+        """Wait for a concurrency slot and a rate limiter token; lower priority values go first.
+
+        Waiters are served in (priority, arrival) order, so a more urgent call
+        jumps the queue, and only the head of the queue draws tokens. Each
+        class may hold at most its share of the concurrency limit, keeping
+        slots free for the classes above it.
+        """
+        entry = (priority, next(self._sequence))
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                if (self._queue[0] == entry and self._in_flight < self.concurrency
+                        and self._in_flight_by.get(priority, 0) < self.allowed(priority)):
+                    wait = await self._rate_limiter.try_acquire()
+                    if self._rate_limiter.rate != self.rate:
+                        # Adapted by another process sharing the bucket
+                        self._apply()
+                    if wait <= 0:
+                        break
+                    # Jitter so processes sharing a bucket do not all retry at the same instant
+                    await self._wait_for_change(wait * random.uniform(1.0, 1.1))
+                else:
+                    await self._wait_for_change()
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._notify()
+        self._in_flight += 1
+        self._in_flight_by[priority] = self._in_flight_by.get(priority, 0) + 1
+
+    def release(self, priority: int = 0) -> None:
+        """Give back a slot taken by acquire."""
+        self._in_flight -= 1
+        self._in_flight_by[priority] -= 1
+        self._notify()
+
+    def record_success(self, latency: float) -> None:
+        """Record a response that was not an overload signal."""
+        if self._latency_avg is not None and latency > self.spike_factor * self._latency_avg:
+            logger.warning(f"Upstream latency spike: {latency:.2f}s against {self._latency_avg:.2f}s average")
+            self._latency_avg = 0.8 * self._latency_avg + 0.2 * latency
+            self._decrease()
+            return
+        self._latency_avg = latency if self._latency_avg is None else 0.8 * self._latency_avg + 0.2 * latency
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._rate_limiter.increase_rate(self.rate_increase / self.limit, self.max_rate)
+        self._apply()
+
+    def record_overload(self) -> None:
+        """Record a 429, server error or timeout."""
+        self._decrease()
+
+    def _decrease(self) -> None:
+        now = monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+        self._rate_limiter.decrease_rate(self.decrease_factor, self.min_rate, self.cooldown)
+        self._apply()
+        logger.warning(f"Upstream overloaded, limits cut to {self.concurrency} concurrent, {self.rate:.2f} req/s")
+
+    def _apply(self) -> None:
+        self.rate = self._rate_limiter.rate
+        if self._on_change:
+            self._on_change(self.limit, self.rate)
+        self._notify()
+
+    async def _wait_for_change(self, timeout: Optional[float] = None) -> None:
+        """Sleep until a slot is released, the queue changes or timeout passes."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._listeners.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if waiter in self._listeners:
+                self._listeners.remove(waiter)
+
+    def _notify(self) -> None:
+        listeners, self._listeners = self._listeners, []
+        for waiter in listeners:
+            if not waiter.done():
+                waiter.set_result(None)
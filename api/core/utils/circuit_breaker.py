@@ -0,0 +1,75 @@
+import logging
+from time import monotonic
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency is degraded.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds. Then one trial call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30,
+                 on_state_change: Optional[Callable[[str], None]] = None) -> None:
+        if failure_threshold <= 0 or reset_timeout <= 0:
+            raise ValueError("Failure threshold and reset timeout must be positive")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._on_state_change = on_state_change
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if a call may not be made now."""
+        state = self.state
+        if state == self.OPEN:
+            remaining = self.reset_timeout - (monotonic() - self._opened_at)
+            raise CircuitOpenError(f"Circuit open, retrying in {remaining:.1f}s")
+        if state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit half-open, trial call in flight")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._trial_in_flight = False
+        if self._state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = monotonic()
+            if self._state != self.OPEN:
+                self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """Abandon a call without an outcome (e.g. cancelled) so a new trial can run."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: str) -> None:
+        logger.warning(f"Circuit breaker {self._state} -> {state}")
+        self._state = state
+        if self._on_state_change:
+            self._on_state_change(state)
@@ -0,0 +1,58 @@
+"""
+LeetCode contest calendar.
+
+Contest rankings and rating history only change after a contest finishes
+and its ratings are published, so contest data can be cached until the
+next contest end plus RATING_UPDATE_DELAY instead of on a fixed TTL.
+
+Weekly contests start every Sunday at 02:30 UTC. Biweekly contests start
+every other Saturday at 14:30 UTC, counted from BIWEEKLY_ANCHOR. Both
+last CONTEST_DURATION.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+WEEKLY_START_WEEKDAY = 6                    # Sunday (Monday is 0)
+WEEKLY_START_TIME = (2, 30)                 # Hour, minute UTC
+# Start of a known biweekly contest (Biweekly Contest 100); later ones follow every 14 days
+BIWEEKLY_ANCHOR = datetime(2023, 3, 18, 14, 30, tzinfo=timezone.utc)
+BIWEEKLY_PERIOD = timedelta(days=14)
+CONTEST_DURATION = timedelta(minutes=90)
+RATING_UPDATE_DELAY = timedelta(hours=6)    # Time allowed for ratings to be published after a contest
+MAX_CONTEST_DATA_TTL = timedelta(days=3)    # Upper bound, in case ratings are published late
+
+
+def next_weekly_end(now: datetime) -> datetime:
+    """Return the end of the first weekly contest ending after now."""
+    hour, minute = WEEKLY_START_TIME
+    start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    start += timedelta(days=(WEEKLY_START_WEEKDAY - now.weekday()) % 7)
+    if start + CONTEST_DURATION <= now:
+        start += timedelta(days=7)
+    return start + CONTEST_DURATION
+
+
+def next_biweekly_end(now: datetime, anchor: datetime = BIWEEKLY_ANCHOR) -> datetime:
+    """Return the end of the first biweekly contest ending after now."""
+    periods = (now - CONTEST_DURATION - anchor) // BIWEEKLY_PERIOD + 1
+    return anchor + periods * BIWEEKLY_PERIOD + CONTEST_DURATION
+
+
+def next_contest_update(now: Optional[datetime] = None,
+                        delay: timedelta = RATING_UPDATE_DELAY,
+                        anchor: datetime = BIWEEKLY_ANCHOR) -> datetime:
+    """Return when contest data next changes: the next contest end plus the rating delay.
+
+    A contest that ended less than delay ago still counts, since its ratings
+    may not be published yet.
+    """
+    now = now or datetime.now(timezone.utc)
+    since = now - delay
+    return min(next_weekly_end(since), next_biweekly_end(since, anchor)) + delay
+
+
+def contest_data_ttl(now: Optional[datetime] = None) -> float:
+    """Seconds contest data may be cached, from now until the next contest update."""
+    now = now or datetime.now(timezone.utc)
+    return min(next_contest_update(now) - now, MAX_CONTEST_DATA_TTL).total_seconds()
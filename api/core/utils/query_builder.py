@@ -0,0 +1,99 @@
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+# Matches one brace group in a field path, e.g. "{easy,medium}"
+_BRACE_GROUP = re.compile(r"\{([^{}]*)\}")
+
+SelectionTree = Dict[str, Any]
+
+
+def expand_field_paths(paths: Iterable[str]) -> List[str]:
+    """Expand brace groups in dotted field paths.
+
+    "matchedUser.profile.{realName,ranking}" becomes
+    ["matchedUser.profile.realName", "matchedUser.profile.ranking"].
+    """
+    expanded: List[str] = []
+    pending = list(paths)
+    while pending:
+        path = pending.pop(0)
+        match = _BRACE_GROUP.search(path)
+        if match is None:
+            expanded.append(path)
+            continue
+        options = [option.strip() for option in match.group(1).split(",")]
+        pending[:0] = [path[:match.start()] + option + path[match.end():] for option in options]
+    return expanded
+
+
+def field_set(paths: Iterable[str]) -> FrozenSet[str]:
+    """Return the expanded, de-duplicated set of dotted field paths."""
+    return frozenset(expand_field_paths(paths))
+
+
+def build_selection_tree(paths: Iterable[str]) -> SelectionTree:
+    """Build a nested dict of field names from dotted field paths."""
+    tree: SelectionTree = {}
+    for path in expand_field_paths(paths):
+        node = tree
+        for name in path.split("."):
+            if not name:
+                raise ValueError(f"Invalid field path: {path!r}")
+            node = node.setdefault(name, {})
+    return tree
+
+
+def unknown_field_paths(paths: Iterable[str], catalog: SelectionTree) -> List[str]:
+    """Return the paths that do not exist in the catalog tree."""
+    unknown = []
+    for path in expand_field_paths(paths):
+        node = catalog
+        for name in path.split("."):
+            if name not in node:
+                unknown.append(path)
+                break
+            node = node[name]
+    return unknown
+
+
+def render_selection(tree: SelectionTree, expressions: Optional[Dict[str, str]] = None,
+                     prefix: str = "", indent: int = 1) -> str:
+    """Render a selection tree as a GraphQL selection set.
+
+    expressions maps dotted paths to the text emitted for that field, so
+    aliases and arguments can be attached (e.g. "submitStats: submitStatsGlobal").
+    """
+    expressions = expressions or {}
+    pad = "    " * indent
+    lines = ["{"]
+    for name, children in tree.items():
+        path = f"{prefix}.{name}" if prefix else name
+        field = expressions.get(path, name)
+        if children:
+            field = f"{field} {render_selection(children, expressions, path, indent + 1)}"
+        lines.append(f"{pad}{field}")
+    lines.append("    " * (indent - 1) + "}")
+    return "\n".join(lines)
+
+
+def select_fields(data: Any, tree: SelectionTree) -> Any:
+    """Return the part of a response covered by a selection tree.
+
+    Lists are projected element-wise and leaves are returned as they are.
+    """
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if not isinstance(data, dict) or not tree:
+        return data
+    return {name: select_fields(data[name], children) for name, children in tree.items() if name in data}
+
+
+def merge_selections(base: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep-merge two responses for disjoint selections without modifying either."""
+    merged = dict(base)
+    for name, value in update.items():
+        if isinstance(merged.get(name), dict) and isinstance(value, dict):
+            merged[name] = merge_selections(merged[name], value)
+        else:
+            merged[name] = value
+    return merged
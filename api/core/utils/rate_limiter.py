@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+from time import monotonic
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Atomically refill and take tokens from a bucket stored as a Redis hash.
+# Uses the Redis server clock so every worker and pod agrees on elapsed time.
+# The refill rate is kept in the hash once it has been adapted: each call
+# adds the caller's pending increase, or multiplies the rate by factor (< 1)
+# if no cut was applied in the last cooldown seconds, so one overload seen
+# by several workers cuts the shared rate once.
+# Returns {wait, rate}: wait is "0" when the tokens were taken, otherwise the
+# seconds to wait.
+TOKEN_BUCKET_SCRIPT = """
+local default_rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local increase = tonumber(ARGV[4])
+local factor = tonumber(ARGV[5])
+local min_rate = tonumber(ARGV[6])
+local max_rate = tonumber(ARGV[7])
+local cooldown = tonumber(ARGV[8])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate', 'cut_ts')
+local rate = tonumber(state[3]) or default_rate
+local cut_ts = tonumber(state[4]) or 0
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local adapted = state[3] ~= false
+if factor < 1 then
+    if now - cut_ts >= cooldown then
+        rate = math.max(min_rate, rate * factor)
+        cut_ts = now
+        adapted = true
+    end
+elseif increase > 0 then
+    rate = math.min(max_rate, rate + increase)
+    adapted = true
+end
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+if adapted then
+    redis.call('HSET', KEYS[1], 'rate', rate, 'cut_ts', cut_ts)
+end
+-- Keep an adapted rate for an hour of inactivity, then start from the default again
+redis.call('PEXPIRE', KEYS[1], math.max(math.ceil(capacity / rate * 1000) + 1000, 3600000))
+return {tostring(wait), tostring(rate)}
+"""
+
+
+class LocalTokenBucket:
+    """In-process token bucket.
+
+    Limits a single process only; used when no Redis is configured, as the
+    fallback while Redis is unreachable, and as a stand-in in tests.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+
+    async def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; return 0 on success or the seconds to wait."""
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until tokens are available and take them."""
+        await _acquire(self, tokens)
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate; tokens already accrued are kept."""
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.rate = rate
+
+    def increase_rate(self, delta: float, max_rate: float) -> None:
+        """Raise the refill rate by delta, up to max_rate."""
+        self.set_rate(min(max_rate, self.rate + delta))
+
+    def decrease_rate(self, factor: float, min_rate: float, cooldown: float) -> None:
+        """Multiply the refill rate by factor, down to min_rate.
+
+        cooldown only matters for shared buckets; a single process gates its
+        own cuts.
+        """
+        self.set_rate(max(min_rate, self.rate * factor))
+
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker and pod through Redis.
+
+    The refill rate is shared as well. increase_rate and decrease_rate are
+    queued and sent with the next try_acquire, where the script applies them
+    to the rate stored next to the tokens; rate then reflects the shared
+    value. Until the first change the bucket refills at the rate it was
+    created with.
+
+    If Redis is unreachable the bucket degrades to a LocalTokenBucket for
+    retry_after seconds before trying Redis again, so upstream calls keep a
+    per-process limit instead of failing.
+    """
+
+    def __init__(self, redis: Redis, rate: float, capacity: float,
+                 key: str = "leetcode:ratelimit:graphql", retry_after: float = 30) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._default_rate = rate
+        self._redis = redis
+        self._key = key
+        self._retry_after = retry_after
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = LocalTokenBucket(rate, capacity)
+        self._redis_down_until = 0.0
+        # Rate changes not yet sent to Redis
+        self._pending_increase = 0.0
+        self._pending_factor = 1.0
+        self._min_rate = self._max_rate = rate
+        self._cooldown = 0.0
+
+    async def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available; return 0 on success or the seconds to wait."""
+        if monotonic() < self._redis_down_until:
+            return await self._fallback.try_acquire(tokens)
+        args = [self._default_rate, self.capacity, tokens, self._pending_increase, self._pending_factor,
+                self._min_rate, self._max_rate, self._cooldown]
+        self._pending_increase, self._pending_factor = 0.0, 1.0
+        try:
+            wait, rate = await self._script(keys=[self._key], args=args)
+            self.rate = float(rate)
+            self._fallback.set_rate(self.rate)
+            return float(wait)
+        except RedisError as e:
+            logger.warning(f"Redis rate limiter unavailable, using local limiter: {e}")
+            self._redis_down_until = monotonic() + self._retry_after
+            return await self._fallback.try_acquire(tokens)
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until tokens are available and take them."""
+        await _acquire(self, tokens)
+
+    def set_rate(self, rate: float) -> None:
+        """Change the rate the shared bucket refills at until its rate is first adapted."""
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = self._default_rate = rate
+        self._fallback.set_rate(rate)
+
+    def increase_rate(self, delta: float, max_rate: float) -> None:
+        """Queue an increase of the shared rate by delta, up to max_rate."""
+        self._pending_increase += delta
+        self._max_rate = max_rate
+        self._fallback.increase_rate(delta, max_rate)
+        self.rate = self._fallback.rate
+
+    def decrease_rate(self, factor: float, min_rate: float, cooldown: float) -> None:
+        """Queue a cut of the shared rate by factor, down to min_rate.
+
+        The cut is skipped if another process cut the rate within cooldown
+        seconds, so the cluster backs off once per overload.
+        """
+        self._pending_factor = min(self._pending_factor, factor)
+        self._min_rate = min_rate
+        self._cooldown = cooldown
+        self._fallback.decrease_rate(factor, min_rate, cooldown)
+        self.rate = self._fallback.rate
+
+
+async def _acquire(bucket, tokens: float) -> None:
+    while True:
+        wait = await bucket.try_acquire(tokens)
+        if wait <= 0:
+            return
+        logger.info(f"Rate limit reached, waiting {wait:.2f} seconds")
+        # Jitter so waiters do not all retry at the same instant
+        await asyncio.sleep(wait * random.uniform(1.0, 1.1))
+
+
+def create_rate_limiter(rate: float, capacity: float, redis: Optional[Redis] = None,
+                        key: str = "leetcode:ratelimit:graphql"):
+    """Return a bucket shared under key when a Redis client is given, else a local one."""
+    if redis is None:
+        return LocalTokenBucket(rate, capacity)
+    return RedisTokenBucket(redis, rate, capacity, key)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from core.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SESSION_REFRESH_INTERVAL = 300  # Minimum seconds between refreshes triggered by auth failures
+SESSION_RETRY_BACKOFF = 5       # Seconds before retrying a failed bootstrap, doubled per failure
+
+
+class SessionCredentials(NamedTuple):
+    """Cookies sent with upstream requests; either may be None."""
+    session_cookie: Optional[str] = None
+    csrf_token: Optional[str] = None
+
+
+class SessionProvider:
+    """Process-wide cache of the upstream session cookie and CSRF token.
+
+    Credentials are fetched once and kept, including the result of a
+    bootstrap that returned no cookie, so callers never pay for a bootstrap
+    request per call. invalidate() marks them stale after an auth failure;
+    the next get() refetches, at most once per refresh_interval.
+
+    A bootstrap that fails (connection error, timeout) is not kept: until
+    it succeeds, callers get the previous credentials, or empty ones, and
+    it is retried after retry_backoff seconds, doubled per failure up to
+    refresh_interval.
+    """
+
+    def __init__(self, refresh_interval: float = SESSION_REFRESH_INTERVAL,
+                 retry_backoff: float = SESSION_RETRY_BACKOFF) -> None:
+        self.refresh_interval = refresh_interval
+        self.retry_backoff = retry_backoff
+        self._credentials: Optional[SessionCredentials] = None
+        self._fetched_at = 0.0
+        self._stale = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._inflight = SingleFlight()
+
+    async def get(self, fetch: Callable[[], Awaitable[SessionCredentials]]) -> SessionCredentials:
+        """Return the cached credentials, calling fetch only to bootstrap or refresh."""
+        if self._credentials is not None and not self._needs_refresh():
+            return self._credentials
+        # Concurrent callers on the same loop share one bootstrap request
+        key = f"bootstrap:{id(asyncio.get_running_loop())}"
+        return await self._inflight.do(key, lambda: self._refresh(fetch))
+
+    def invalidate(self) -> None:
+        """Mark the credentials stale, e.g. after a 401/403 from upstream."""
+        if self._credentials is not None and not self._stale:
+            logger.info("Upstream session credentials invalidated")
+            self._stale = True
+
+    def _needs_refresh(self) -> bool:
+        if self._failures:
+            return monotonic() >= self._retry_at
+        return self._stale and monotonic() - self._fetched_at >= self.refresh_interval
+
+    async def _refresh(self, fetch: Callable[[], Awaitable[SessionCredentials]]) -> SessionCredentials:
+        if self._credentials is not None and not self._needs_refresh():
+            return self._credentials
+        try:
+            credentials = await fetch()
+        except Exception as e:
+            self._failures += 1
+            backoff = min(self.retry_backoff * 2 ** (self._failures - 1), self.refresh_interval)
+            self._retry_at = monotonic() + backoff
+            logger.error(f"Failed to bootstrap session credentials, retrying in {backoff:.0f}s: {str(e)}")
+            if self._credentials is None:
+                self._credentials = SessionCredentials()
+            return self._credentials
+        self._credentials = credentials
+        self._fetched_at = monotonic()
+        self._stale = False
+        self._failures = 0
+        logger.info(f"Session credentials bootstrapped (cookie: {credentials.session_cookie is not None}, "
+                    f"csrf: {credentials.csrf_token is not None})")
+        return credentials
+
+
+# Shared by every GQLQuery in the process
+default_session_provider = SessionProvider()
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same task and receive its result or exception. The
+    call runs as its own task, so a cancelled caller does not cancel it for
+    the others.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already in flight for key."""
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start fn for key without waiting, unless a call for key is already in flight.
+
+        Used for background refreshes; the task is held until it finishes.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            logger.debug(f"Joining in-flight call for {key}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Return the number of keys with a call in flight."""
+        return len(self._inflight)
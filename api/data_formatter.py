@@ -3,6 +3,17 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# User data fields read when formatting the profile for the results template
+REQUIRED_FIELDS = [
+    "matchedUser.username",
+    "matchedUser.profile.{realName,ranking,reputation,company,school,starRating,userAvatar}",
+    "matchedUser.submitStats.acSubmissionNum.{difficulty,count}",
+    "matchedUser.tagProblemCounts.{advanced,intermediate,fundamental}.{tagName,problemsSolved}",
+    "matchedUser.userCalendar.{streak,totalActiveDays}",
+    "userContestRanking.{rating,attendedContestsCount,globalRanking,topPercentage}",
+    "allQuestionsCount.{difficulty,count}",
+]
+
 def format_solved_problems_data(data):
     try:
         logger.debug("Formatting solved problems data")
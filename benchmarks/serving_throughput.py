@@ -0,0 +1,119 @@
+"""
+Side-by-side throughput comparison of the WSGI and ASGI serving paths.
+
+The upstream LeetCode call is replaced by a fixed-latency sleep so the
+comparison measures how many upstream fetches each serving mode keeps in
+flight, not leetcode.com itself. The WSGI path is driven through Flask with a
+thread pool sized like one gunicorn sync worker (--threads 2); the ASGI path
+is driven by awaiting the ASGI app concurrently on one event loop, as a single
+uvicorn worker would.
+
+Usage:
+    python benchmarks/serving_throughput.py --requests 200 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+logging.disable(logging.CRITICAL)
+
+import app as wsgi_module  # noqa: E402
+import asgi as asgi_module  # noqa: E402
+
+SAMPLE_DATA = {
+    "matchedUser": {
+        "username": "benchmark",
+        "profile": {"ranking": 100000, "userAvatar": ""},
+        "submitStats": {
+            "acSubmissionNum": [
+                {"difficulty": "All", "count": 300, "submissions": 600},
+                {"difficulty": "Easy", "count": 120, "submissions": 200},
+                {"difficulty": "Medium", "count": 150, "submissions": 300},
+                {"difficulty": "Hard", "count": 30, "submissions": 100}
+            ],
+            "totalSubmissionNum": []
+        },
+        "tagProblemCounts": {"advanced": [], "intermediate": [], "fundamental": []}
+    },
+    "userContestRanking": None,
+    "allQuestionsCount": [{"difficulty": "All", "count": 3000}]
+}
+
+
+def install_fake_upstream(latency: float) -> None:
+    """Replace the upstream GraphQL call with a fixed-latency sleep"""
+    async def fake_call_api(graphql_query, username, *args, **kwargs):
+        await asyncio.sleep(latency)
+        return {"data": SAMPLE_DATA}
+
+    wsgi_module.leetcode_api._call_api = fake_call_api
+
+
+def run_wsgi(requests: int, threads: int) -> float:
+    client = wsgi_module.app.test_client()
+
+    def fetch(i: int) -> int:
+        return client.get(f"/api/analysis/wsgi-user-{i}").status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+    assert all(status == 200 for status in statuses), statuses
+    return elapsed
+
+
+async def run_asgi(requests: int) -> float:
+    async def fetch(i: int) -> int:
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET',
+            'path': f"/api/analysis/asgi-user-{i}", 'root_path': '',
+            'query_string': b'', 'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 8080), 'scheme': 'http'
+        }
+        await asgi_module.app(scope, receive, send)
+        return sent[0]['status']
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(fetch(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    assert all(status == 200 for status in statuses), statuses
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200, help='requests per mode (all cache misses)')
+    parser.add_argument('--latency', type=float, default=0.2, help='simulated upstream latency in seconds')
+    parser.add_argument('--threads', type=int, default=2, help='WSGI threads per worker')
+    args = parser.parse_args()
+
+    install_fake_upstream(args.latency)
+
+    wsgi_elapsed = run_wsgi(args.requests, args.threads)
+    asgi_elapsed = asyncio.run(run_asgi(args.requests))
+    wsgi_module.shutdown_event_loop()
+
+    print(f"{args.requests} cache-miss requests, {args.latency * 1000:.0f}ms simulated upstream latency, one worker")
+    print(f"{'mode':<28}{'elapsed (s)':>12}{'req/s':>10}")
+    print(f"{'WSGI (sync, ' + str(args.threads) + ' threads)':<28}{wsgi_elapsed:>12.2f}{args.requests / wsgi_elapsed:>10.1f}")
+    print(f"{'ASGI (native async)':<28}{asgi_elapsed:>12.2f}{args.requests / asgi_elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """Process-wide asyncio event loop running in a daemon thread.
+
+    Sync code (e.g. Flask views) submits coroutines to the loop instead of
+    creating a new loop per request, so loop-bound state such as pooled HTTP
+    sessions and background tasks survives between requests. The loop is
+    started lazily, which keeps it safe with pre-forking servers: every worker
+    process starts its own loop on first use.
+    """
+
+    def __init__(self, name: str = "background-event-loop") -> None:
+        self._name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if needed and return the running loop."""
+        with self._lock:
+            if self._is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                try:
+                    loop.run_forever()
+                finally:
+                    loop.close()
+
+            thread = threading.Thread(target=_run, name=self._name, daemon=True)
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            logger.info(f"Started background event loop in process {self._pid}")
+            return loop
+
+    def is_running(self) -> bool:
+        """Return True if the loop thread is alive in this process."""
+        with self._lock:
+            return self._is_alive()
+
+    def _is_alive(self) -> bool:
+        return (
+            self._loop is not None
+            and self._thread is not None
+            and self._thread.is_alive()
+            and self._pid == os.getpid()
+        )
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule a coroutine on the loop and return a concurrent Future."""
+        loop = self.start()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it completes.
+
+        Raises concurrent.futures.TimeoutError if it does not finish within
+        timeout seconds; the coroutine is cancelled in that case.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run() cannot be called from the event loop thread")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: Optional[float] = 5) -> None:
+        """Stop the loop and wait for the thread to exit."""
+        with self._lock:
+            if not self._is_alive():
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+            self._pid = None
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        logger.info("Stopped background event loop")
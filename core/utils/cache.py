@@ -1,20 +1,105 @@
+import heapq
+import logging
+import sys
+from collections import OrderedDict
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from threading import Lock
-from typing import Dict, Any, Optional
+from itertools import count
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from weakref import WeakValueDictionary
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Recorded by caches created with a name, labelled by that name and the entry's data type
+CACHE_HITS = Counter('cache_hits_total', 'Cache lookups answered with a fresh value', ['cache', 'data_type'])
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that found no servable value', ['cache', 'data_type'])
+CACHE_STALE_HITS = Counter('cache_stale_hits_total', 'Cache lookups answered with a value in its grace window',
+                           ['cache', 'data_type'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Cache entries evicted', ['cache', 'data_type', 'reason'])
+CACHE_HIT_AGE = Histogram('cache_hit_age_seconds', 'Age of cached values when served', ['cache', 'data_type'],
+                          buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 21600, 86400, float('inf')))
+
+MAX_CACHE_ENTRIES = 10000             # Entries kept before the least recently used are evicted
+MAX_CACHE_BYTES = 64 * 1024 * 1024    # Approximate size budget of all cached values (64 MiB)
+SWEEP_INTERVAL = 5                    # Seconds between background sweeps of expired entries
+SWEEP_BATCH = 200                     # Expiry events handled per lock acquisition
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a value, following dicts, lists, tuples and sets."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
 
 
 @dataclass
 class CacheEntry:
     data: Any
-    expiry: datetime
+    expiry: float       # time.monotonic() deadlines
+    stale_until: float  # End of the grace window in which the expired value may still be served
+    data_type: str = 'default'
+    size: int = 0  # Estimated bytes of key and data as stored
+    created: float = 0.0  # time.monotonic() when the value was stored
+    decoded_size: int = 0  # Estimated bytes of key and data as Python objects
+    encoded: bool = False  # data holds the codec's bytes, decoded on each hit
+    version: int = 0  # Tells this entry's expiry events from those of replaced entries
+    stale: bool = False  # Past expiry and counted as stale by the sweeper
 
 
 class InMemoryCache:
-    """Thread-safe in-memory cache with TTL support."""
+    """Thread-safe in-memory cache with TTL support and bounded LRU eviction.
 
-    def __init__(self) -> None:
-        self._cache: Dict[str, CacheEntry] = {}
+    The cache holds at most max_entries entries and roughly max_bytes of
+    data; beyond that the least recently used entries are evicted. A data
+    type may also get its own entry quota (see set_quota), so that one type,
+    e.g. negative entries for random usernames, cannot push out the rest.
+
+    With a codec (see core.utils.codec) values are stored encoded and
+    decoded on every hit, trading a little CPU for memory; values the codec
+    cannot encode are stored as they are.
+
+    Expiry deadlines are kept in a min-heap on the monotonic clock. sweep()
+    pops the events that are due, in bounded batches: at its expiry an
+    entry is counted as stale, at the end of its grace window it is removed.
+    Reads check the deadlines themselves, so a late sweep never serves
+    expired data; run a CacheSweeper to reclaim memory of entries nobody
+    reads. get_stats is O(1) from counters kept up to date by the sweeps.
+
+    A cache given a name records hits, misses, stale hits, evictions and the
+    age of served values as Prometheus metrics; register_cache_metrics adds
+    its entry count and size per data type.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES, max_bytes: int = MAX_CACHE_BYTES,
+                 quotas: Optional[Dict[str, int]] = None, codec=None, name: Optional[str] = None) -> None:
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError("Cache limits must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.name = name
+        # Least recently used first, overall and per data type
+        self._cache: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._by_type: Dict[str, OrderedDict[str, None]] = {}
+        self._bytes = 0
+        self._bytes_by_type: Dict[str, int] = {}
+        self._decoded_bytes = 0
+        self._quotas: Dict[str, int] = {}
+        for data_type, quota in (quotas or {}).items():
+            self.set_quota(data_type, quota)
+        self._evictions: Dict[str, int] = {}  # Reason -> entries evicted
+        # (deadline, version, key) of each entry's next expiry event; replaced entries leave
+        # events behind that are skipped when popped
+        self._expiry_heap: List[Tuple[float, int, str]] = []
+        self._versions = count()
+        self._stale = 0
         self._lock: Lock = Lock()
         # Default TTLs for different types of data
         self._ttls: Dict[str, int] = {
@@ -22,49 +107,171 @@ class InMemoryCache:
             'contests': 1800,    # 30 minutes
             'submissions': 300,  # 5 minutes
             'problems': 3600,    # 1 hour
+            'calendar': 3600,    # 1 hour, submission calendar of the current year
+            'profile_meta': 21600,     # 6 hours, profile details and badges
+            'tag_counts': 900,         # 15 minutes, solved counts per difficulty and tag
+            'contest_ranking': 1800,   # 30 minutes
+            'contest_history': 3600,   # 1 hour
+            'calendar_archive': 31536000,  # 1 year, past years never change
+            'analysis': 900,     # 15 minutes, same as the most volatile user data it is derived from
+            'negative': 120,     # 2 minutes, unknown usernames and empty responses
             'default': 300      # 5 minutes
         }
+        # Seconds an expired entry may still be served stale, per data type (none by default)
+        self._grace: Dict[str, int] = {}
+
+    def get(self, key: str, data_type: Optional[str] = None, record_miss: bool = True) -> Optional[Any]:
+        """Get value from cache if it exists and hasn't expired.
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if it exists and hasn't expired."""
+        data_type only labels the miss metric when the key is not cached.
+        With record_miss False a miss is not counted, for probes that are
+        followed by another lookup of the same key.
+        """
         with self._lock:
             if key not in self._cache:
+                if record_miss:
+                    self._record_miss(data_type)
+                return None
+
+            entry: CacheEntry = self._cache[key]
+            now: float = monotonic()
+            if now > entry.expiry:
+                if now > entry.stale_until:
+                    self._remove(key, 'expired')
+                if record_miss:
+                    self._record_miss(entry.data_type)
                 return None
 
+            self._touch(key, entry)
+        self._record_hit(CACHE_HITS, entry, now)
+        return self._value(entry)
+
+    def get_with_staleness(self, key: str, data_type: Optional[str] = None,
+                           record_miss: bool = True) -> Tuple[Optional[Any], bool]:
+        """Get (value, is_stale), serving expired values within their grace window.
+
+        Callers that receive a stale value should trigger a refresh.
+        """
+        with self._lock:
+            if key not in self._cache:
+                if record_miss:
+                    self._record_miss(data_type)
+                return None, False
+
             entry: CacheEntry = self._cache[key]
-            if datetime.now() > entry.expiry:
-                del self._cache[key]
+            now: float = monotonic()
+            if now > entry.stale_until:
+                self._remove(key, 'expired')
+                if record_miss:
+                    self._record_miss(entry.data_type)
+                return None, False
+
+            self._touch(key, entry)
+        is_stale: bool = now > entry.expiry
+        self._record_hit(CACHE_STALE_HITS if is_stale else CACHE_HITS, entry, now)
+        return self._value(entry), is_stale
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until key expires (negative once expired), or None if it is not cached."""
+        with self._lock:
+            entry: Optional[CacheEntry] = self._cache.get(key)
+            if entry is None:
                 return None
+            return entry.expiry - monotonic()
 
-            return entry.data
+    def set(self, key: str, value: Any, data_type: str = 'default', ttl: Optional[float] = None) -> None:
+        """Set value in cache with TTL based on data type, unless ttl is given.
 
-    def set(self, key: str, value: Any, data_type: str = 'default') -> None:
-        """Set value in cache with TTL based on data type."""
-        ttl: int = self._ttls.get(data_type, self._ttls['default'])
+        Evicts least recently used entries to stay within the limits. A value
+        larger than the whole byte budget is not cached.
+        """
+        if ttl is None:
+            ttl = self.get_ttl(data_type)
+        grace: int = self.get_grace(data_type)
+        now: float = monotonic()
+        expiry: float = now + ttl
+        stored, encoded = value, False
+        if self.codec is not None:
+            try:
+                stored, encoded = self.codec.encode(value), True
+            except (TypeError, ValueError):
+                pass
+        decoded_size: int = estimate_size(key) + estimate_size(value)
+        size: int = estimate_size(key) + estimate_size(stored) if encoded else decoded_size
         with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                self._count_eviction('too_large', data_type)
+                return
+            version: int = next(self._versions)
             self._cache[key] = CacheEntry(
-                data=value,
-                expiry=datetime.now() + timedelta(seconds=ttl)
+                data=stored,
+                expiry=expiry,
+                stale_until=expiry + grace,
+                data_type=data_type,
+                size=size,
+                created=now,
+                decoded_size=decoded_size,
+                encoded=encoded,
+                version=version
             )
+            heapq.heappush(self._expiry_heap, (expiry, version, key))
+            self._compact()
+            self._by_type.setdefault(data_type, OrderedDict())[key] = None
+            self._bytes += size
+            self._bytes_by_type[data_type] = self._bytes_by_type.get(data_type, 0) + size
+            self._decoded_bytes += decoded_size
+            self._evict(data_type)
 
     def delete(self, key: str) -> None:
         """Remove an item from cache."""
         with self._lock:
-            self._cache.pop(key, None)
+            if key in self._cache:
+                self._remove(key)
 
-    def cleanup(self) -> int:
-        """Remove all expired entries and return count of removed items."""
+    def sweep(self, batch: int = SWEEP_BATCH) -> Tuple[int, bool]:
+        """Handle up to batch due expiry events; return (entries removed, whether more are due)."""
+        removed = 0
         with self._lock:
-            now: datetime = datetime.now()
-            expired: list[str] = [k for k, v in self._cache.items() if now > v.expiry]
-            for k in expired:
-                del self._cache[k]
-            return len(expired)
+            now: float = monotonic()
+            for _ in range(batch):
+                if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                    return removed, False
+                _, version, key = heapq.heappop(self._expiry_heap)
+                entry: Optional[CacheEntry] = self._cache.get(key)
+                if entry is None or entry.version != version:
+                    continue
+                if entry.stale or now > entry.stale_until:
+                    self._remove(key, 'expired')
+                    removed += 1
+                else:
+                    entry.stale = True
+                    self._stale += 1
+                    heapq.heappush(self._expiry_heap, (entry.stale_until, version, key))
+            return removed, bool(self._expiry_heap) and self._expiry_heap[0][0] <= now
+
+    def cleanup(self) -> int:
+        """Remove all entries past their grace window and return count of removed items.
+
+        Works in sweep batches, releasing the lock between them.
+        """
+        removed, more = self.sweep()
+        while more:
+            batch_removed, more = self.sweep()
+            removed += batch_removed
+        return removed
 
     def clear(self) -> None:
         """Clear all cache entries."""
         with self._lock:
             self._cache.clear()
+            self._by_type.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+            self._bytes_by_type.clear()
+            self._decoded_bytes = 0
+            self._stale = 0
 
     def set_ttl(self, data_type: str, ttl: int) -> None:
         """Update TTL for a specific data type."""
@@ -72,15 +279,192 @@ class InMemoryCache:
             raise ValueError("TTL must be positive")
         self._ttls[data_type] = ttl
 
+    def get_ttl(self, data_type: str) -> int:
+        """Return the TTL of a data type."""
+        return self._ttls.get(data_type, self._ttls['default'])
+
+    def get_grace(self, data_type: str) -> int:
+        """Return the grace window of a data type."""
+        return self._grace.get(data_type, 0)
+
+    def set_grace(self, data_type: str, grace: int) -> None:
+        """Update the stale-while-revalidate grace window for a data type (0 disables it)."""
+        if grace < 0:
+            raise ValueError("Grace window must not be negative")
+        self._grace[data_type] = grace
+
+    def set_quota(self, data_type: str, max_entries: int) -> None:
+        """Limit the number of entries of a data type; its least recently used are evicted first."""
+        if max_entries <= 0:
+            raise ValueError("Quota must be positive")
+        self._quotas[data_type] = max_entries
+
+    def _value(self, entry: CacheEntry) -> Any:
+        return self.codec.decode(entry.data) if entry.encoded else entry.data
+
+    def _touch(self, key: str, entry: CacheEntry) -> None:
+        """Mark key as most recently used."""
+        self._cache.move_to_end(key)
+        self._by_type[entry.data_type].move_to_end(key)
+
+    def _remove(self, key: str, reason: Optional[str] = None) -> None:
+        """Drop key, counting it as an eviction if a reason is given. Caller holds the lock."""
+        entry: CacheEntry = self._cache.pop(key)
+        keys = self._by_type[entry.data_type]
+        del keys[key]
+        if not keys:
+            del self._by_type[entry.data_type]
+            del self._bytes_by_type[entry.data_type]
+        else:
+            self._bytes_by_type[entry.data_type] -= entry.size
+        self._bytes -= entry.size
+        self._decoded_bytes -= entry.decoded_size
+        if entry.stale:
+            self._stale -= 1
+        if reason:
+            self._count_eviction(reason, entry.data_type)
+
+    def _count_eviction(self, reason: str, data_type: str) -> None:
+        self._evictions[reason] = self._evictions.get(reason, 0) + 1
+        if self.name is not None:
+            CACHE_EVICTIONS.labels(self.name, data_type, reason).inc()
+
+    def _record_hit(self, counter: Counter, entry: CacheEntry, now: float) -> None:
+        if self.name is not None:
+            counter.labels(self.name, entry.data_type).inc()
+            CACHE_HIT_AGE.labels(self.name, entry.data_type).observe(now - entry.created)
+
+    def _record_miss(self, data_type: Optional[str]) -> None:
+        if self.name is not None:
+            CACHE_MISSES.labels(self.name, data_type or 'unknown').inc()
+
+    def _compact(self) -> None:
+        """Rebuild the expiry heap once replaced entries' events make up most of it."""
+        if len(self._expiry_heap) <= 2 * len(self._cache) + 64:
+            return
+        self._expiry_heap = [
+            (entry.stale_until if entry.stale else entry.expiry, entry.version, key)
+            for key, entry in self._cache.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+
+    def _evict(self, data_type: str) -> None:
+        """Evict least recently used entries until data_type and the cache are within limits."""
+        quota: Optional[int] = self._quotas.get(data_type)
+        while quota is not None and len(self._by_type.get(data_type, ())) > quota:
+            self._remove(next(iter(self._by_type[data_type])), 'quota')
+        while len(self._cache) > self.max_entries:
+            self._remove(next(iter(self._cache)), 'max_entries')
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._cache)), 'max_bytes')
+
     def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics."""
+        """Get cache statistics; expiry counts are as of the last sweep.
+
+        Sweeps remove entries without a grace window at their expiry, so the
+        expired entries still held are those inside their grace window.
+        """
         with self._lock:
             total_entries: int = len(self._cache)
-            now: datetime = datetime.now()
-            expired: int = sum(1 for v in self._cache.values() if now > v.expiry)
             return {
                 'total_entries': total_entries,
-                'expired_entries': expired,
-                'active_entries': total_entries - expired,
-                'ttls': dict(self._ttls)
+                'expired_entries': self._stale,
+                'active_entries': total_entries - self._stale,
+                'entries_by_type': {t: len(keys) for t, keys in self._by_type.items()},
+                'estimated_bytes': self._bytes,
+                'bytes_by_type': dict(self._bytes_by_type),
+                'decoded_bytes': self._decoded_bytes,
+                'codec': self.codec.name if self.codec else None,
+                # Without the codec every entry would take decoded_bytes_per_entry
+                'bytes_per_entry': self._bytes / total_entries if total_entries else 0,
+                'decoded_bytes_per_entry': self._decoded_bytes / total_entries if total_entries else 0,
+                'saved_bytes_per_entry': (self._decoded_bytes - self._bytes) / total_entries if total_entries else 0,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'evictions': dict(self._evictions),
+                'ttls': dict(self._ttls),
+                'grace': dict(self._grace),
+                'quotas': dict(self._quotas)
             }
+
+
+class CacheSweeper:
+    """Daemon thread that sweeps expired entries out of a cache every interval.
+
+    Works with any cache that has a sweep(batch) method. Each sweep takes
+    the cache lock for one batch at a time, so readers wait at most for one
+    batch of expiry events.
+    """
+
+    def __init__(self, cache, interval: float = SWEEP_INTERVAL, batch: int = SWEEP_BATCH) -> None:
+        if interval <= 0 or batch <= 0:
+            raise ValueError("Sweep interval and batch must be positive")
+        self.cache = cache
+        self.interval = interval
+        self.batch = batch
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="cache-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                more = True
+                while more and not self._stop.is_set():
+                    _, more = self.cache.sweep(self.batch)
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {str(e)}", exc_info=True)
+
+
+class CacheMetricsCollector:
+    """Exports the entry count and estimated bytes of registered caches per data type.
+
+    Read from get_stats at scrape time, so the caches do no work for it.
+    """
+
+    def __init__(self) -> None:
+        self._caches: "WeakValueDictionary[str, Any]" = WeakValueDictionary()
+
+    def add(self, name: str, cache) -> None:
+        self._caches[name] = cache
+
+    def describe(self) -> Iterator[GaugeMetricFamily]:
+        yield GaugeMetricFamily('cache_entries', 'Cached entries', labels=['cache', 'data_type'])
+        yield GaugeMetricFamily('cache_estimated_bytes', 'Estimated bytes held by cached entries',
+                                labels=['cache', 'data_type'])
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        entries = GaugeMetricFamily('cache_entries', 'Cached entries', labels=['cache', 'data_type'])
+        size = GaugeMetricFamily('cache_estimated_bytes', 'Estimated bytes held by cached entries',
+                                 labels=['cache', 'data_type'])
+        for name, cache in list(self._caches.items()):
+            stats = cache.get_stats()
+            for data_type, entry_count in stats['entries_by_type'].items():
+                entries.add_metric([name, data_type], entry_count)
+            for data_type, estimated in stats['bytes_by_type'].items():
+                size.add_metric([name, data_type], estimated)
+        yield entries
+        yield size
+
+
+CACHE_METRICS = CacheMetricsCollector()
+REGISTRY.register(CACHE_METRICS)
+
+
+def register_cache_metrics(cache) -> None:
+    """Export the size of a named cache (InMemoryCache or TieredCache)."""
+    if cache.name is None:
+        raise ValueError("Only named caches can be exported")
+    CACHE_METRICS.add(cache.name, cache)
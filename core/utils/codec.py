@@ -0,0 +1,35 @@
+import json
+import zlib
+from typing import Any
+
+
+class JsonCodec:
+    """Encodes JSON-compatible values as compact UTF-8 JSON."""
+
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        """Return value as bytes; raises TypeError or ValueError for values JSON cannot hold."""
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ZlibJsonCodec(JsonCodec):
+    """Compact JSON compressed with zlib.
+
+    User payloads are mostly repeated keys, badge URLs and the
+    submissionCalendar JSON string, which compress several times over.
+    """
+
+    name = "zlib+json"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def encode(self, value: Any) -> bytes:
+        return zlib.compress(super().encode(value), self.level)
+
+    def decode(self, data: bytes) -> Any:
+        return super().decode(zlib.decompress(data))
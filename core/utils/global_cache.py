@@ -0,0 +1,96 @@
+import json
+import logging
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from core.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_DATA_TTL = 21600  # Seconds site-wide data is kept (6 hours)
+
+
+class GlobalDataCache:
+    """Cache for site-wide data that is the same for every user.
+
+    Values are kept per process and, when a Redis client is given, shared
+    through Redis so a cluster fetches each value once per TTL. A failed
+    fetch is not cached; the last known value is served instead. If Redis
+    is unreachable the cache works per process for retry_after seconds.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None, ttl: float = GLOBAL_DATA_TTL,
+                 key_prefix: str = "leetcode:global:", retry_after: float = 30) -> None:
+        if ttl <= 0:
+            raise ValueError("TTL must be positive")
+        self.ttl = ttl
+        self._redis = redis
+        self._key_prefix = key_prefix
+        self._retry_after = retry_after
+        self._redis_down_until = 0.0
+        self._values: Dict[str, Tuple[Any, float]] = {}  # name -> (value, expires at)
+        self._inflight = SingleFlight()
+
+    async def get(self, name: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the value for name, calling fetch only if no fresh copy is cached.
+
+        fetch should return None on failure.
+        """
+        value, expires_at = self._values.get(name, (None, 0.0))
+        if value is not None and monotonic() < expires_at:
+            return value
+        return await self._inflight.do(name, lambda: self._load(name, fetch))
+
+    def invalidate(self, name: str) -> None:
+        """Drop the process copy of name; the shared copy expires on its own."""
+        self._values.pop(name, None)
+
+    async def _load(self, name: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        shared = await self._get_shared(name)
+        if shared is not None:
+            value, ttl = shared
+            self._values[name] = (value, monotonic() + ttl)
+            return value
+
+        logger.info(f"Fetching global data: {name}")
+        value = await fetch()
+        if value is None:
+            logger.warning(f"Failed to fetch global data {name}, serving the last known value")
+            return self._values.get(name, (None, 0.0))[0]
+        self._values[name] = (value, monotonic() + self.ttl)
+        await self._set_shared(name, value)
+        return value
+
+    def _redis_available(self) -> bool:
+        return self._redis is not None and monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: RedisError) -> None:
+        logger.warning(f"Redis global data cache unavailable, using the process cache: {e}")
+        self._redis_down_until = monotonic() + self._retry_after
+
+    async def _get_shared(self, name: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, seconds left) from Redis, or None."""
+        if not self._redis_available():
+            return None
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.get(self._key_prefix + name)
+            pipe.pttl(self._key_prefix + name)
+            raw, pttl = await pipe.execute()
+        except RedisError as e:
+            self._redis_failed(e)
+            return None
+        if raw is None or pttl <= 0:
+            return None
+        return json.loads(raw), pttl / 1000
+
+    async def _set_shared(self, name: str, value: Any) -> None:
+        if not self._redis_available():
+            return
+        try:
+            await self._redis.set(self._key_prefix + name, json.dumps(value), px=int(self.ttl * 1000))
+        except RedisError as e:
+            self._redis_failed(e)
@@ -0,0 +1,33 @@
+import logging
+import os
+from typing import Optional
+
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+
+logger = logging.getLogger(__name__)
+
+# Connection settings for the shared Redis service (see k8s/base/redis-deployment.yaml)
+REDIS_HOST = os.environ.get("REDIS_HOST")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
+REDIS_DB = int(os.environ.get("REDIS_DB", "0"))
+REDIS_SOCKET_TIMEOUT = 0.5  # Seconds; Redis calls sit on the request path
+
+
+def create_async_redis(host: Optional[str] = REDIS_HOST, port: int = REDIS_PORT,
+                       db: int = REDIS_DB) -> Optional[aioredis.Redis]:
+    """Return an asyncio Redis client, or None when no Redis host is configured."""
+    if not host:
+        return None
+    logger.info(f"Using shared Redis at {host}:{port}/{db}")
+    return aioredis.Redis(
+        host=host,
+        port=port,
+        db=db,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        # Fail fast; callers fall back to local state instead of retrying
+        retry=Retry(NoBackoff(), 0)
+    )
+
@@ -0,0 +1,268 @@
+import logging
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+from core.utils.cache import SWEEP_BATCH, InMemoryCache
+from core.utils.codec import JsonCodec
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_LOOKUPS = Counter('cache_shared_lookups_total', 'Shared tier lookups after an L1 miss or stale hit',
+                               ['cache', 'outcome'])
+
+# (key, value, data_type, ttl) as passed to set()
+CacheItem = Tuple[str, Any, str, Optional[float]]
+
+
+class LocalStore:
+    """In-process stand-in for the asyncio Redis commands TieredCache uses.
+
+    Lets tests, or several caches in one process, share an L2 tier without a
+    Redis server.
+    """
+
+    def __init__(self) -> None:
+        self._values: Dict[str, Tuple[bytes, float]] = {}  # key -> (value, expires at)
+        self._lock = Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, px: int) -> bool:
+        self._set(key, value, px)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._values.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction: bool = False) -> "_LocalPipeline":
+        return _LocalPipeline(self)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value, expires_at = self._values.get(key, (None, 0.0))
+            if value is None or monotonic() >= expires_at:
+                self._values.pop(key, None)
+                return None
+            return value
+
+    def _set(self, key: str, value: Any, px: int) -> None:
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._values[key] = (value, monotonic() + px / 1000)
+
+
+class _LocalPipeline:
+    """Buffers LocalStore writes until execute(), like a Redis pipeline."""
+
+    def __init__(self, store: LocalStore) -> None:
+        self._store = store
+        self._writes: List[Tuple[str, Any, int]] = []
+
+    def set(self, key: str, value: Any, px: int) -> "_LocalPipeline":
+        self._writes.append((key, value, px))
+        return self
+
+    async def execute(self) -> List[bool]:
+        for key, value, px in self._writes:
+            self._store._set(key, value, px)
+        results, self._writes = [True] * len(self._writes), []
+        return results
+
+
+class TieredCache:
+    """InMemoryCache interface over a per-process L1 and a shared L2 tier.
+
+    Reads (get, get_with_staleness, ttl_remaining) are served from L1 only
+    and never wait on the network. Callers that miss, or hit a stale entry,
+    await load() for those keys: one MGET fetches the shared copies and any
+    fresher than L1 are promoted into it with their remaining TTL, so an
+    entry fetched by one worker is reused by all of them until it expires.
+    set() and delete() are coroutines that write both tiers. Entries carry
+    their wall-clock expiry and grace window through the shared tier, and the
+    shared key expires at the end of the grace window.
+
+    l2 is an asyncio Redis client (or LocalStore), or None to run on L1 only.
+    After a failure the cache works from L1 only for retry_after seconds.
+    Shared entries are stored with codec (JSON by default); values it cannot
+    encode stay in L1.
+
+    Hit and miss metrics are recorded by L1 under its name; shared tier
+    lookups are counted by outcome (hit, miss, error) on top of those.
+    Callers that load() after an L1 miss should probe with record_miss
+    False and count the lookup that follows the load, so a key served from
+    the shared tier counts as one hit.
+    """
+
+    def __init__(self, l1: InMemoryCache, l2=None, key_prefix: str = "leetcode:cache:",
+                 retry_after: float = 30, codec=None) -> None:
+        self.l1 = l1
+        self.codec = codec or JsonCodec()
+        self._l2 = l2
+        self._key_prefix = key_prefix
+        self._retry_after = retry_after
+        self._l2_down_until = 0.0
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.l1.name
+
+    def get(self, key: str, data_type: Optional[str] = None, record_miss: bool = True) -> Optional[Any]:
+        """Get value from L1 if it exists and hasn't expired."""
+        return self.l1.get(key, data_type, record_miss)
+
+    def get_with_staleness(self, key: str, data_type: Optional[str] = None,
+                           record_miss: bool = True) -> Tuple[Optional[Any], bool]:
+        """Get (value, is_stale) from L1, serving expired values within their grace window."""
+        return self.l1.get_with_staleness(key, data_type, record_miss)
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Seconds until the L1 copy of key expires (negative once expired), or None if it is not cached."""
+        return self.l1.ttl_remaining(key)
+
+    async def load(self, keys: Iterable[str], min_ttl: float = 0) -> int:
+        """Promote shared entries fresher than L1 for keys; return how many were promoted.
+
+        Keys whose L1 copy has more than min_ttl seconds left are not looked up.
+        """
+        keys = [key for key in dict.fromkeys(keys) if not self._l1_fresh(key, min_ttl)]
+        if not keys or not self._l2_available():
+            return 0
+        try:
+            raw_values = await self._l2.mget([self._key_prefix + key for key in keys])
+        except RedisError as e:
+            self._l2_failed(e)
+            self._record_shared_lookup('error', len(keys))
+            return 0
+        promoted = 0
+        for key, raw in zip(keys, raw_values):
+            shared = self._decode_shared(key, raw)
+            if shared is None:
+                continue
+            remaining = shared["expiry"] - time()
+            l1_remaining = self.l1.ttl_remaining(key)
+            if l1_remaining is not None and remaining <= l1_remaining:
+                continue
+            self.l1.set(key, shared["data"], shared["data_type"], remaining)
+            promoted += 1
+        return promoted
+
+    async def set(self, key: str, value: Any, data_type: str = 'default', ttl: Optional[float] = None) -> None:
+        """Set value in both tiers with TTL based on data type, unless ttl is given."""
+        await self.set_many([(key, value, data_type, ttl)])
+
+    async def set_many(self, items: Iterable[CacheItem]) -> None:
+        """Set several (key, value, data_type, ttl) items, writing the shared tier in one pipeline."""
+        now = time()
+        shared: List[Tuple[str, bytes, int]] = []
+        for key, value, data_type, ttl in items:
+            if ttl is None:
+                ttl = self.l1.get_ttl(data_type)
+            self.l1.set(key, value, data_type, ttl)
+            if self._l2 is None:
+                continue
+            stale_until = now + ttl + self.l1.get_grace(data_type)
+            try:
+                payload = self.codec.encode({
+                    "data": value,
+                    "data_type": data_type,
+                    "expiry": now + ttl,
+                    "stale_until": stale_until
+                })
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Not sharing cache entry {key}, the {self.codec.name} codec cannot encode it: {e}")
+                continue
+            shared.append((self._key_prefix + key, payload, max(1, int((stale_until - now) * 1000))))
+        if not shared or not self._l2_available():
+            return
+        try:
+            pipe = self._l2.pipeline(transaction=False)
+            for key, payload, px in shared:
+                pipe.set(key, payload, px=px)
+            await pipe.execute()
+        except RedisError as e:
+            self._l2_failed(e)
+
+    async def delete(self, key: str) -> None:
+        """Remove an item from both tiers."""
+        self.l1.delete(key)
+        if not self._l2_available():
+            return
+        try:
+            await self._l2.delete(self._key_prefix + key)
+        except RedisError as e:
+            self._l2_failed(e)
+
+    def cleanup(self) -> int:
+        """Remove L1 entries past their grace window; the shared tier expires its own."""
+        return self.l1.cleanup()
+
+    def sweep(self, batch: int = SWEEP_BATCH) -> Tuple[int, bool]:
+        """Sweep expired entries out of L1."""
+        return self.l1.sweep(batch)
+
+    def clear(self) -> None:
+        """Clear L1; shared entries are left to expire, other workers may still use them."""
+        self.l1.clear()
+
+    def get_ttl(self, data_type: str) -> int:
+        return self.l1.get_ttl(data_type)
+
+    def set_ttl(self, data_type: str, ttl: int) -> None:
+        self.l1.set_ttl(data_type, ttl)
+
+    def get_grace(self, data_type: str) -> int:
+        return self.l1.get_grace(data_type)
+
+    def set_grace(self, data_type: str, grace: int) -> None:
+        self.l1.set_grace(data_type, grace)
+
+    def set_quota(self, data_type: str, max_entries: int) -> None:
+        self.l1.set_quota(data_type, max_entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get L1 statistics and whether the shared tier is in use."""
+        stats = self.l1.get_stats()
+        stats['shared_tier'] = self._l2_available()
+        return stats
+
+    def _l1_fresh(self, key: str, min_ttl: float) -> bool:
+        remaining = self.l1.ttl_remaining(key)
+        return remaining is not None and remaining > min_ttl
+
+    def _l2_available(self) -> bool:
+        return self._l2 is not None and monotonic() >= self._l2_down_until
+
+    def _l2_failed(self, e: RedisError) -> None:
+        logger.warning(f"Shared cache tier unavailable, using the process cache only: {e}")
+        self._l2_down_until = monotonic() + self._retry_after
+
+    def _decode_shared(self, key: str, raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            self._record_shared_lookup('miss')
+            return None
+        try:
+            shared = self.codec.decode(raw)
+        except Exception as e:
+            # E.g. written by a worker with another codec during a rollout
+            logger.warning(f"Ignoring undecodable shared cache entry {key}: {e}")
+            self._record_shared_lookup('error')
+            return None
+        if time() > shared["stale_until"]:
+            self._record_shared_lookup('miss')
+            return None
+        self._record_shared_lookup('hit')
+        return shared
+
+    def _record_shared_lookup(self, outcome: str, count: int = 1) -> None:
+        if self.name is not None:
+            SHARED_CACHE_LOOKUPS.labels(self.name, outcome).inc(count)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The service imports its modules relative to api/, as gunicorn runs it from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+
+class FakeClock:
+    """Stands in for time.monotonic (or time.time) in the module under test."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from core.utils.adaptive_limiter import AIMDLimiter
+from core.utils.rate_limiter import LocalTokenBucket
+
+
+def make_limiter(concurrency: float = 1, rate: float = 1000, **kwargs) -> AIMDLimiter:
+    return AIMDLimiter(LocalTokenBucket(rate, rate), initial_rate=rate, min_rate=1, max_rate=rate * 2,
+                       initial_concurrency=concurrency, min_concurrency=1, max_concurrency=10, **kwargs)
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.request("user-016")
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority_then_arrival():
+    limiter = make_limiter()
+    await limiter.acquire(0)
+    admitted = []
+
+    async def call(priority: int, name: str) -> None:
+        await limiter.acquire(priority)
+        admitted.append(name)
+        limiter.release(priority)
+
+    tasks = [asyncio.create_task(call(priority, name))
+             for priority, name in [(2, "bulk"), (1, "refresh"), (0, "first"), (0, "second")]]
+    await settle()
+    assert admitted == []
+    limiter.release(0)
+    await asyncio.gather(*tasks)
+    assert admitted == ["first", "second", "refresh", "bulk"]
+
+
+@pytest.mark.request("user-016")
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = make_limiter()
+    await limiter.acquire(0)
+    cancelled = asyncio.create_task(limiter.acquire(0))
+    waiting = asyncio.create_task(limiter.acquire(1))
+    await settle()
+    cancelled.cancel()
+    await settle()
+    limiter.release(0)
+    await asyncio.wait_for(waiting, 1)
+    assert limiter.in_flight == 1
+    assert not limiter._queue
+
+
+@pytest.mark.request("user-016")
+@pytest.mark.asyncio
+async def test_slot_shares_keep_slots_for_more_urgent_classes():
+    limiter = make_limiter(concurrency=4, slot_shares={2: 0.5})
+    await limiter.acquire(2)
+    await limiter.acquire(2)
+    blocked = asyncio.create_task(limiter.acquire(2))
+    await settle()
+    assert not blocked.done()
+    await asyncio.wait_for(limiter.acquire(0), 1)
+    blocked.cancel()
+
+
+@pytest.mark.request("user-015")
+def test_overload_cuts_limits_once_per_cooldown():
+    changes = []
+    limiter = make_limiter(concurrency=8, rate=100, cooldown=60, on_change=lambda *c: changes.append(c))
+    limiter.record_overload()
+    limiter.record_overload()
+    assert limiter.limit == 4
+    assert limiter.rate == 50
+    assert changes[-1] == (4, 50)
+
+
+@pytest.mark.request("user-015")
+def test_success_raises_limits_additively():
+    limiter = make_limiter(concurrency=2, rate=100, rate_increase=1)
+    limiter.record_success(0.1)
+    assert limiter.limit == pytest.approx(2.5)
+    assert limiter.rate == pytest.approx(100.4)
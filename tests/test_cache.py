@@ -0,0 +1,115 @@
+import pytest
+
+from core.utils import cache as cache_module
+from core.utils.cache import InMemoryCache
+from core.utils.codec import ZlibJsonCodec
+
+
+@pytest.fixture
+def cache_clock(clock, monkeypatch):
+    monkeypatch.setattr(cache_module, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.request("user-020")
+def test_get_returns_value_until_ttl(cache_clock):
+    cache = InMemoryCache()
+    cache.set("key", {"a": 1}, ttl=10)
+    assert cache.get("key") == {"a": 1}
+    cache_clock.advance(11)
+    assert cache.get("key") is None
+
+
+@pytest.mark.request("user-020")
+def test_least_recently_used_entry_is_evicted(cache_clock):
+    cache = InMemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get_stats()["evictions"] == {"max_entries": 1}
+
+
+@pytest.mark.request("user-020")
+def test_byte_budget_evicts_and_rejects_oversized_values(cache_clock):
+    cache = InMemoryCache(max_bytes=2000)
+    cache.set("a", "x" * 800)
+    cache.set("b", "x" * 800)
+    cache.set("c", "x" * 800)
+    assert cache.get("a") is None
+    assert cache.get_stats()["estimated_bytes"] <= 2000
+    cache.set("huge", "x" * 5000)
+    assert cache.get("huge") is None
+    assert cache.get_stats()["evictions"]["too_large"] == 1
+
+
+@pytest.mark.request("user-020")
+def test_quota_only_evicts_its_own_type(cache_clock):
+    cache = InMemoryCache(max_entries=10, quotas={"negative": 2})
+    cache.set("user", 1, "profile")
+    for name in ("a", "b", "c"):
+        cache.set(f"missing:{name}", "not_found", "negative")
+    assert cache.get("missing:a") is None
+    assert cache.get("missing:c") == "not_found"
+    assert cache.get("user") == 1
+    assert cache.get_stats()["entries_by_type"] == {"profile": 1, "negative": 2}
+
+
+@pytest.mark.request("user-012")
+def test_stale_value_served_within_grace(cache_clock):
+    cache = InMemoryCache()
+    cache.set_grace("profile", 60)
+    cache.set("key", "value", "profile", ttl=10)
+    cache_clock.advance(30)
+    assert cache.get("key") is None
+    assert cache.get_with_staleness("key") == ("value", True)
+    cache_clock.advance(41)
+    assert cache.get_with_staleness("key") == (None, False)
+
+
+@pytest.mark.request("user-024")
+def test_sweep_removes_entries_past_grace(cache_clock):
+    cache = InMemoryCache()
+    cache.set_grace("profile", 20)
+    cache.set("short", 1, "profile", ttl=10)
+    cache.set("long", 2, "profile", ttl=100)
+    cache_clock.advance(15)
+    assert cache.sweep() == (0, False)
+    assert cache.get_stats()["expired_entries"] == 1
+    cache_clock.advance(20)
+    assert cache.sweep() == (1, False)
+    assert cache.ttl_remaining("short") is None
+    assert cache.get("long") == 2
+
+
+@pytest.mark.request("user-024")
+def test_sweep_works_in_batches(cache_clock):
+    cache = InMemoryCache()
+    for i in range(5):
+        cache.set(f"key{i}", i, ttl=1)
+    cache_clock.advance(2)
+    assert cache.sweep(batch=3) == (3, True)
+    assert cache.cleanup() == 2
+    assert cache.get_stats()["total_entries"] == 0
+
+
+@pytest.mark.request("user-024")
+def test_replaced_entry_keeps_only_its_new_deadline(cache_clock):
+    cache = InMemoryCache()
+    cache.set("key", 1, ttl=5)
+    cache.set("key", 2, ttl=50)
+    cache_clock.advance(10)
+    assert cache.sweep() == (0, False)
+    assert cache.get("key") == 2
+
+
+@pytest.mark.request("user-022")
+def test_codec_stores_values_encoded(cache_clock):
+    cache = InMemoryCache(codec=ZlibJsonCodec())
+    value = {"calendar": "{}" * 1000}
+    cache.set("key", value)
+    assert cache.get("key") == value
+    stats = cache.get_stats()
+    assert stats["estimated_bytes"] < stats["decoded_bytes"]
@@ -0,0 +1,83 @@
+import pytest
+import pytest_asyncio
+
+import GQLQuery as gqlquery
+from GQLQuery import GQLQuery
+from cache_warmer import ContestRefresher, RefreshAheadWarmer
+from core.utils.tiered_cache import LocalStore
+
+FIELDS = [
+    "matchedUser.username",
+    "matchedUser.profile.ranking",
+    "matchedUser.submitStats.acSubmissionNum.{difficulty,count}",
+]
+SUBMIT_STATS = {"acSubmissionNum": [{"difficulty": "All", "count": 42}]}
+
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    client = GQLQuery(fields=FIELDS)
+    client.queries = []
+
+    async def upstream(query, username):
+        client.queries.append(query)
+        return {"data": {"u0": {"submitStats": SUBMIT_STATS}}}
+
+    monkeypatch.setattr(client, "_call_api", upstream)
+    yield client
+    await client.close()
+
+
+async def cache_fragment(client, fragment, data, ttl):
+    await client.cache.set(f"user_fragment:{fragment}:alice", {
+        "fields": sorted(client._fragment_fields[fragment]),
+        "data": data
+    }, fragment, ttl)
+
+
+@pytest.mark.request("user-013")
+@pytest.mark.asyncio
+async def test_only_due_fragments_of_hot_users_are_refreshed(client):
+    warmer = RefreshAheadWarmer(client, refresh_ahead=120, min_score=2)
+    await cache_fragment(client, "profile_meta", {"matchedUser": {"username": "alice", "profile": {}}}, 3600)
+    await cache_fragment(client, "tag_counts", {"matchedUser": {"submitStats": SUBMIT_STATS}}, 60)
+    for _ in range(3):
+        warmer.record("alice")
+    warmer.record("bob")
+
+    assert warmer.due_users() == {"alice": ["tag_counts"]}
+    assert await warmer.run_once() == 1
+    [query] = client.queries
+    assert "submitStats" in query["query"]
+    assert "profile" not in query["query"]
+    assert client.due_fragments("alice", 120) == []
+
+
+@pytest.mark.request("user-019")
+@pytest.mark.asyncio
+async def test_contest_refresh_skips_users_a_peer_already_refreshed(monkeypatch):
+    store = LocalStore()
+    workers = [GQLQuery(fields=["userContestRanking.rating"], shared_cache=store) for _ in range(2)]
+    queries = []
+
+    async def upstream(query, username):
+        queries.append(query)
+        return {"data": {f"{alias}_contestRanking": {"rating": 1500} for alias in query["variables"]}}
+
+    try:
+        # Both workers cached the users' contest data before the update
+        monkeypatch.setattr(gqlquery, "contest_data_ttl", lambda: 0)
+        for worker in workers:
+            monkeypatch.setattr(worker, "_call_api", upstream)
+            await worker.refresh_contest_data(["alice", "bob"])
+        monkeypatch.setattr(gqlquery, "contest_data_ttl", lambda: 3600)
+        queries.clear()
+
+        first, second = (ContestRefresher(worker) for worker in workers)
+        assert first.due_users() == second.due_users() == ["alice", "bob"]
+        assert await first.run_once() == 2
+        assert await second.run_once() == 0
+        assert len(queries) == 1
+    finally:
+        for worker in workers:
+            await worker.close()
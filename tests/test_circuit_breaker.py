@@ -0,0 +1,66 @@
+import pytest
+
+from core.utils import circuit_breaker
+from core.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+pytestmark = pytest.mark.request("user-010")
+
+
+@pytest.fixture
+def breaker(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "monotonic", clock)
+    states = []
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, on_state_change=states.append)
+    breaker.states = states
+    return breaker
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.states == [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED]
+
+
+def test_failed_trial_reopens(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.advance(29)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_released_trial_allows_another(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.advance(30)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.utils.contest_schedule import (
+    MAX_CONTEST_DATA_TTL,
+    contest_data_ttl,
+    next_biweekly_end,
+    next_contest_update,
+    next_weekly_end,
+)
+
+pytestmark = pytest.mark.request("user-019")
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_next_weekly_end_is_sunday_at_four():
+    # Wednesday
+    assert next_weekly_end(utc(2024, 5, 15, 12, 0)) == utc(2024, 5, 19, 4, 0)
+    # Sunday during the contest, and right after it ended
+    assert next_weekly_end(utc(2024, 5, 19, 3, 0)) == utc(2024, 5, 19, 4, 0)
+    assert next_weekly_end(utc(2024, 5, 19, 4, 0)) == utc(2024, 5, 26, 4, 0)
+
+
+def test_next_biweekly_end_follows_the_anchor():
+    anchor = utc(2024, 5, 11, 14, 30)
+    assert next_biweekly_end(utc(2024, 5, 11, 10, 0), anchor) == utc(2024, 5, 11, 16, 0)
+    assert next_biweekly_end(utc(2024, 5, 11, 16, 0), anchor) == utc(2024, 5, 25, 16, 0)
+    assert next_biweekly_end(utc(2024, 5, 20, 0, 0), anchor) == utc(2024, 5, 25, 16, 0)
+
+
+def test_next_contest_update_adds_the_rating_delay():
+    anchor = utc(2024, 5, 11, 14, 30)
+    # Saturday morning: the biweekly contest that evening comes first
+    assert next_contest_update(utc(2024, 5, 11, 10, 0), anchor=anchor) == utc(2024, 5, 11, 22, 0)
+    # Sunday morning after the weekly contest: its ratings are still pending
+    assert next_contest_update(utc(2024, 5, 12, 6, 0), anchor=anchor) == utc(2024, 5, 12, 10, 0)
+    assert next_contest_update(utc(2024, 5, 12, 6, 0), delay=timedelta(hours=1),
+                               anchor=anchor) == utc(2024, 5, 19, 5, 0)
+
+
+def test_contest_data_ttl_is_capped():
+    # Monday: the next update is Sunday, more than three days away
+    assert contest_data_ttl(utc(2024, 5, 13, 12, 0)) == MAX_CONTEST_DATA_TTL.total_seconds()
+    now = utc(2024, 5, 19, 6, 0)
+    assert contest_data_ttl(now) == (next_contest_update(now) - now).total_seconds()
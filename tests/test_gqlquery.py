@@ -0,0 +1,253 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from prometheus_client import REGISTRY
+
+import GQLQuery as gqlquery
+from GQLQuery import GQLQuery
+from core.utils.tiered_cache import LocalStore
+
+FIELDS = [
+    "matchedUser.username",
+    "matchedUser.profile.ranking",
+    "matchedUser.submitStats.acSubmissionNum.{difficulty,count}",
+    "allQuestionsCount.{difficulty,count}",
+]
+ALL_QUESTIONS = [{"difficulty": "All", "count": 3000}]
+SUBMIT_STATS = {"acSubmissionNum": [{"difficulty": "All", "count": 42}]}
+
+
+class FakeUpstream:
+    """Answers GraphQL calls from canned data and records the queries sent."""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    async def __call__(self, query, username):
+        self.queries.append(query)
+        if query.get("operationName") == "GlobalData":
+            return {"data": {"allQuestionsCount": ALL_QUESTIONS}}
+        if query.get("operationName") == "MultiUserCompleteData":
+            return {"data": {alias: self.users.get(name) for alias, name in query["variables"].items()}}
+        return {"data": {"matchedUser": self.users.get(query["variables"]["username"])}}
+
+    def user_queries(self):
+        return [query for query in self.queries if query.get("operationName") != "GlobalData"]
+
+
+class CountingStore(LocalStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.reads = 0
+
+    async def mget(self, keys):
+        self.reads += 1
+        return await super().mget(keys)
+
+
+@pytest.fixture
+def upstream():
+    return FakeUpstream({
+        "alice": {"username": "alice", "profile": {"ranking": 5}, "submitStats": SUBMIT_STATS},
+    })
+
+
+@pytest_asyncio.fixture
+async def client(upstream, monkeypatch):
+    client = GQLQuery(fields=FIELDS, shared_cache=CountingStore())
+    monkeypatch.setattr(client, "_call_api", upstream)
+    yield client
+    await client.close()
+
+
+async def cache_profile(client, username, ranking):
+    await client.cache.set(f"user_fragment:profile_meta:{username}", {
+        "fields": sorted(client._fragment_fields["profile_meta"]),
+        "data": {"matchedUser": {"username": username, "profile": {"ranking": ranking}}}
+    }, "profile_meta")
+
+
+@pytest.mark.request("user-017")
+@pytest.mark.asyncio
+async def test_only_missing_fragments_are_fetched_and_merged(client, upstream):
+    await cache_profile(client, "alice", 7)
+    # Upstream answers only the fields asked for
+    upstream.users["alice"] = {"submitStats": SUBMIT_STATS}
+
+    data = await client.get_user_complete_data("alice")
+
+    assert data == {
+        "matchedUser": {"username": "alice", "profile": {"ranking": 7}, "submitStats": SUBMIT_STATS},
+        "allQuestionsCount": ALL_QUESTIONS,
+    }
+    [query] = upstream.user_queries()
+    assert "submitStats" in query["query"]
+    assert "ranking" not in query["query"]
+
+
+@pytest.mark.request("user-021")
+@pytest.mark.asyncio
+async def test_fully_cached_user_makes_no_calls(client, upstream):
+    first = await client.get_user_complete_data("alice")
+    calls, reads = len(upstream.queries), client.cache._l2.reads
+
+    assert await client.get_user_complete_data("alice") == first
+    assert len(upstream.queries) == calls
+    assert client.cache._l2.reads == reads
+
+
+@pytest.mark.request("user-014")
+@pytest.mark.asyncio
+async def test_unknown_user_is_cached_negatively(client, upstream):
+    assert await client.get_user_complete_data("nobody") == {}
+    assert client.is_known_missing("nobody")
+    assert await client.get_user_complete_data("nobody") == {}
+    assert len(upstream.user_queries()) == 1
+
+
+@pytest.mark.request("user-025")
+@pytest.mark.asyncio
+async def test_negative_probe_is_not_counted_as_a_miss(client):
+    labels = {"cache": "user_data", "data_type": "negative"}
+    before = REGISTRY.get_sample_value("cache_misses_total", labels) or 0
+    await client.get_user_complete_data("alice")
+    await client.get_user_complete_data("alice")
+    assert (REGISTRY.get_sample_value("cache_misses_total", labels) or 0) == before
+
+
+
+def cache_lookups(name):
+    """Total hits and misses recorded so far for every fragment of the named cache."""
+    totals = {"cache_hits_total": 0, "cache_misses_total": 0}
+    for metric in REGISTRY.collect():
+        for sample in metric.samples:
+            if sample.name in totals and sample.labels.get("cache") == name \
+                    and sample.labels.get("data_type") != "negative":
+                totals[sample.name] += sample.value
+    return totals["cache_hits_total"], totals["cache_misses_total"]
+
+
+@pytest.mark.request("user-025")
+@pytest.mark.asyncio
+async def test_shared_tier_hit_is_counted_once(upstream, monkeypatch):
+    store = LocalStore()
+    first, second = GQLQuery(fields=FIELDS, shared_cache=store), GQLQuery(fields=FIELDS, shared_cache=store)
+    try:
+        for worker in (first, second):
+            monkeypatch.setattr(worker, "_call_api", upstream)
+        await first.get_user_complete_data("alice")
+        hits, misses = cache_lookups(second.cache.l1.name)
+        await second.get_user_complete_data("alice")
+        fragments = len(second._fragment_fields)
+        assert cache_lookups(second.cache.l1.name) == (hits + fragments, misses)
+    finally:
+        await first.close()
+        await second.close()
+
+@pytest.mark.request("user-018")
+@pytest.mark.asyncio
+async def test_batch_fetch_adds_global_fields_to_cached_users(client, upstream):
+    await client.get_user_complete_data("alice")
+    upstream.users["bob"] = {"username": "bob", "profile": {"ranking": 9}, "submitStats": SUBMIT_STATS}
+
+    results = await client.get_users_complete_data(["alice", "bob", "nobody"])
+
+    assert results["alice"]["allQuestionsCount"] == ALL_QUESTIONS
+    assert results["bob"]["matchedUser"]["profile"] == {"ranking": 9}
+    assert results["bob"]["allQuestionsCount"] == ALL_QUESTIONS
+    assert results["nobody"] == {}
+    [batch] = [query for query in upstream.user_queries() if query.get("operationName") == "MultiUserCompleteData"]
+    assert sorted(batch["variables"].values()) == ["bob", "nobody"]
+
+
+@pytest.mark.request("user-021")
+@pytest.mark.asyncio
+async def test_user_fetched_by_another_worker_is_served_from_the_shared_tier(upstream, monkeypatch):
+    store = LocalStore()
+    first, second = GQLQuery(fields=FIELDS, shared_cache=store), GQLQuery(fields=FIELDS, shared_cache=store)
+    try:
+        for worker in (first, second):
+            monkeypatch.setattr(worker, "_call_api", upstream)
+        data = await first.get_user_complete_data("alice")
+        calls = len(upstream.user_queries())
+        assert await second.get_user_complete_data("alice") == data
+        assert len(upstream.user_queries()) == calls
+    finally:
+        await first.close()
+        await second.close()
+
+
+
+@pytest.mark.request("user-009")
+@pytest.mark.asyncio
+async def test_calendar_history_fetches_only_past_years_once(client, upstream, monkeypatch):
+    year = datetime.now(timezone.utc).year
+    years = []
+
+    async def calendar_year(query, username):
+        years.append(query["variables"]["year"])
+        day = str(int(datetime(query["variables"]["year"], 3, 1, tzinfo=timezone.utc).timestamp()))
+        return {"data": {"matchedUser": {"userCalendar": {"submissionCalendar": json.dumps({day: 2})}}}}
+
+    monkeypatch.setattr(client, "_call_api", calendar_year)
+    current = {"activeYears": [year - 2, year - 1, year], "streak": 4, "submissionCalendar": '{"1": 0, "2": 1}'}
+
+    history = await client.get_user_calendar_history("alice", current)
+    assert sorted(years) == [year - 2, year - 1]
+    assert history["streak"] == 4
+    assert history["totalActiveDays"] == 3
+    assert len(json.loads(history["submissionCalendar"])) == 4
+
+    assert await client.get_user_calendar_history("alice", current) == history
+    assert len(years) == 2
+
+CHALLENGE_PAGE = "<html><body>Just a moment...</body></html>"
+
+
+@pytest_asyncio.fixture
+async def html_upstream(monkeypatch):
+    """A real HTTP server answering GraphQL posts with the queued (status, body) pairs."""
+    responses = []
+
+    async def graphql(request):
+        status, body = responses.pop(0)
+        content_type = "application/json" if body.startswith("{") else "text/html"
+        return web.Response(status=status, text=body, content_type=content_type)
+
+    app = web.Application()
+    app.router.add_post("/graphql", graphql)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(gqlquery, "GRAPHQL_URL", str(server.make_url("/graphql")))
+    monkeypatch.setattr(GQLQuery, "_backoff", staticmethod(lambda attempt, retry_after=None: 0))
+    yield responses
+    await server.close()
+
+
+@pytest.mark.request("user-010")
+@pytest.mark.asyncio
+async def test_non_json_client_error_returns_empty_dict(html_upstream):
+    client = GQLQuery(fields=FIELDS, session_cookie="cookie", max_retries=2)
+    html_upstream.append((403, CHALLENGE_PAGE))
+    try:
+        assert await client._call_api({"query": "{}"}, "alice") == {}
+        assert html_upstream == []
+    finally:
+        await client.close()
+
+
+@pytest.mark.request("user-010")
+@pytest.mark.asyncio
+async def test_non_json_success_is_retried(html_upstream):
+    client = GQLQuery(fields=FIELDS, session_cookie="cookie", max_retries=2)
+    html_upstream.extend([(200, CHALLENGE_PAGE), (200, '{"data": {"ok": true}}')])
+    try:
+        assert await client._call_api({"query": "{}"}, "alice") == {"data": {"ok": True}}
+        assert html_upstream == []
+    finally:
+        await client.close()
@@ -0,0 +1,104 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from core.utils import rate_limiter
+from core.utils.rate_limiter import LocalTokenBucket, RedisTokenBucket, create_rate_limiter
+
+
+@pytest.fixture
+def bucket_clock(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "monotonic", clock)
+    return clock
+
+
+class DownRedis:
+    """Redis client whose script calls always fail."""
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise ConnectionError("connection refused")
+        return run
+
+
+@pytest.mark.request("user-005")
+@pytest.mark.asyncio
+async def test_local_bucket_allows_burst_then_reports_wait(bucket_clock):
+    bucket = LocalTokenBucket(rate=2, capacity=3)
+    assert [await bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert await bucket.try_acquire() == pytest.approx(0.5)
+
+
+@pytest.mark.request("user-005")
+@pytest.mark.asyncio
+async def test_local_bucket_refills_up_to_capacity(bucket_clock):
+    bucket = LocalTokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        await bucket.try_acquire()
+    bucket_clock.advance(10)
+    assert [await bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert await bucket.try_acquire() > 0
+
+
+@pytest.mark.request("user-015")
+@pytest.mark.asyncio
+async def test_set_rate_keeps_accrued_tokens(bucket_clock):
+    bucket = LocalTokenBucket(rate=1, capacity=10)
+    for _ in range(10):
+        await bucket.try_acquire()
+    bucket_clock.advance(2)
+    bucket.set_rate(100)
+    assert await bucket.try_acquire(2) == 0
+    assert await bucket.try_acquire() == pytest.approx(0.01)
+
+
+@pytest.mark.request("user-015")
+def test_rate_changes_are_clamped():
+    bucket = LocalTokenBucket(rate=4, capacity=1)
+    bucket.increase_rate(10, max_rate=6)
+    assert bucket.rate == 6
+    bucket.decrease_rate(0.1, min_rate=2, cooldown=5)
+    assert bucket.rate == 2
+
+
+@pytest.mark.request("user-005")
+def test_invalid_rate_is_rejected():
+    with pytest.raises(ValueError):
+        LocalTokenBucket(rate=0, capacity=1)
+    with pytest.raises(ValueError):
+        LocalTokenBucket(rate=1, capacity=1).set_rate(-1)
+
+
+@pytest.mark.request("user-005")
+def test_create_rate_limiter_without_redis_is_local():
+    assert isinstance(create_rate_limiter(5, 2), LocalTokenBucket)
+
+
+@pytest.mark.request("user-005")
+@pytest.mark.asyncio
+async def test_redis_bucket_falls_back_to_local_while_redis_is_down(bucket_clock):
+    bucket = RedisTokenBucket(DownRedis(), rate=1, capacity=2, retry_after=30)
+    assert await bucket.try_acquire() == 0
+    assert await bucket.try_acquire() == 0
+    assert await bucket.try_acquire() == pytest.approx(1)
+    assert bucket._redis_down_until == bucket_clock.now + 30
+
+
+@pytest.mark.request("user-015")
+@pytest.mark.asyncio
+async def test_shared_rate_is_cut_once_per_cooldown():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first = RedisTokenBucket(fakeredis.FakeAsyncRedis(server=server), rate=10, capacity=5)
+    second = RedisTokenBucket(fakeredis.FakeAsyncRedis(server=server), rate=10, capacity=5)
+
+    # Both processes see the same overload; the shared rate is halved once
+    first.decrease_rate(0.5, min_rate=1, cooldown=60)
+    second.decrease_rate(0.5, min_rate=1, cooldown=60)
+    await first.try_acquire()
+    await second.try_acquire()
+    assert first.rate == second.rate == pytest.approx(5)
+
+    second.increase_rate(1, max_rate=20)
+    await second.try_acquire()
+    await first.try_acquire()
+    assert first.rate == second.rate == pytest.approx(6)
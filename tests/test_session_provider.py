@@ -0,0 +1,68 @@
+import pytest
+
+from core.utils import session_provider
+from core.utils.session_provider import SessionCredentials, SessionProvider
+
+pytestmark = pytest.mark.request("user-011")
+
+
+@pytest.fixture
+def provider_clock(clock, monkeypatch):
+    monkeypatch.setattr(session_provider, "monotonic", clock)
+    return clock
+
+
+class Bootstrap:
+    """Answers bootstrap fetches with the queued results, raising exceptions."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_without_cookie_is_kept(provider_clock):
+    provider = SessionProvider()
+    fetch = Bootstrap(SessionCredentials())
+    assert await provider.get(fetch) == SessionCredentials()
+    provider_clock.advance(3600)
+    assert await provider.get(fetch) == SessionCredentials()
+    assert fetch.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_bootstrap_is_retried_after_backoff(provider_clock):
+    provider = SessionProvider(retry_backoff=5)
+    fetch = Bootstrap(OSError("connection refused"), OSError("connection refused"), SessionCredentials("cookie"))
+    assert await provider.get(fetch) == SessionCredentials()
+    provider_clock.advance(4)
+    assert await provider.get(fetch) == SessionCredentials()
+    assert fetch.calls == 1
+
+    provider_clock.advance(1)
+    assert await provider.get(fetch) == SessionCredentials()
+    # The second failure doubles the backoff
+    provider_clock.advance(5)
+    await provider.get(fetch)
+    assert fetch.calls == 2
+    provider_clock.advance(5)
+    assert await provider.get(fetch) == SessionCredentials("cookie")
+    assert fetch.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_the_previous_credentials(provider_clock):
+    provider = SessionProvider(refresh_interval=300)
+    fetch = Bootstrap(SessionCredentials("old"), OSError("timeout"))
+    await provider.get(fetch)
+    provider.invalidate()
+    provider_clock.advance(300)
+    assert await provider.get(fetch) == SessionCredentials("old")
+    assert fetch.calls == 2
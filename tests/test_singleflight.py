@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from core.utils.singleflight import SingleFlight
+
+pytestmark = pytest.mark.request("user-004")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    callers = [asyncio.create_task(flight.do("key", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 1
+    release.set()
+    assert await asyncio.gather(*callers) == ["value"] * 3
+    assert calls == 1
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_caller_and_is_not_cached():
+    flight = SingleFlight()
+    attempts = 0
+
+    async def fetch():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(flight.do("key", fetch), flight.do("key", fetch), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        await flight.do("key", fetch)
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "value"
+
+    cancelled = asyncio.create_task(flight.do("key", fetch))
+    waiting = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    release.set()
+    assert await waiting == "value"
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def fetch(value):
+        await asyncio.sleep(0)
+        return value
+
+    assert await asyncio.gather(flight.do("a", lambda: fetch(1)), flight.do("b", lambda: fetch(2))) == [1, 2]
@@ -0,0 +1,130 @@
+import pytest
+from redis.exceptions import ConnectionError
+
+from core.utils.cache import InMemoryCache
+from core.utils.codec import ZlibJsonCodec
+from core.utils.tiered_cache import LocalStore, TieredCache
+
+pytestmark = pytest.mark.request("user-021")
+
+
+class CountingStore(LocalStore):
+    """LocalStore that records the keys of every read."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.reads = []
+
+    async def mget(self, keys):
+        self.reads.append(list(keys))
+        return await super().mget(keys)
+
+
+class DownStore(LocalStore):
+    """Shared tier that is unreachable."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    async def mget(self, keys):
+        self.calls += 1
+        raise ConnectionError("connection refused")
+
+    def pipeline(self, transaction=False):
+        self.calls += 1
+        raise ConnectionError("connection refused")
+
+
+def tiered(store, **kwargs) -> TieredCache:
+    return TieredCache(InMemoryCache(), store, codec=ZlibJsonCodec(), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_entry_written_by_one_worker_is_promoted_in_another():
+    store = LocalStore()
+    writer, reader = tiered(store), tiered(store)
+    await writer.set("user", {"name": "alice"}, "profile", ttl=100)
+
+    assert reader.get("user") is None
+    assert await reader.load(["user"]) == 1
+    assert reader.get("user") == {"name": "alice"}
+    assert 99 < reader.ttl_remaining("user") <= 100
+
+
+@pytest.mark.asyncio
+async def test_reads_and_fresh_keys_never_reach_the_shared_tier():
+    store = CountingStore()
+    cache = tiered(store)
+    await cache.set("user", 1, "profile", ttl=100)
+    cache.get("user")
+    cache.get("unknown")
+    cache.get_with_staleness("unknown")
+    assert await cache.load(["user"]) == 0
+    assert store.reads == []
+    await cache.load(["user", "other"])
+    assert store.reads == [["leetcode:cache:other"]]
+
+
+@pytest.mark.request("user-013")
+@pytest.mark.asyncio
+async def test_min_ttl_looks_up_entries_about_to_expire():
+    store = CountingStore()
+    writer, reader = tiered(store), tiered(store)
+    await reader.set("user", "old", "profile", ttl=30)
+    await writer.set("user", "new", "profile", ttl=300)
+    assert await reader.load(["user"]) == 0
+    assert await reader.load(["user"], min_ttl=60) == 1
+    assert reader.get("user") == "new"
+
+
+@pytest.mark.asyncio
+async def test_older_shared_copy_does_not_replace_l1():
+    store = LocalStore()
+    writer, reader = tiered(store), tiered(store)
+    await writer.set("user", "shared", "profile", ttl=30)
+    reader.l1.set("user", "local", "profile", ttl=-1)
+    assert await reader.load(["user"]) == 1
+    await writer.set("user", "older", "profile", ttl=5)
+    assert await reader.load(["user"], min_ttl=60) == 0
+    assert reader.get("user") == "shared"
+
+
+@pytest.mark.asyncio
+async def test_set_many_writes_both_tiers():
+    store = LocalStore()
+    writer, reader = tiered(store), tiered(store)
+    await writer.set_many([("a", 1, "profile", None), ("b", 2, "calendar", 50)])
+    assert writer.get("a") == 1
+    assert await reader.load(["a", "b"]) == 2
+    assert reader.get("b") == 2
+
+
+@pytest.mark.asyncio
+async def test_unencodable_values_stay_in_l1():
+    store = LocalStore()
+    writer, reader = tiered(store), tiered(store)
+    await writer.set("key", {1, 2}, "profile")
+    assert writer.get("key") == {1, 2}
+    assert await reader.load(["key"]) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_shared_tier_falls_back_to_l1_for_retry_after():
+    store = DownStore()
+    cache = tiered(store, retry_after=30)
+    await cache.set("user", 1, "profile")
+    assert cache.get("user") == 1
+    assert await cache.load(["other"]) == 0
+    assert store.calls == 1
+    assert cache.get_stats()["shared_tier"] is False
+
+
+@pytest.mark.asyncio
+async def test_without_shared_tier_cache_is_l1_only():
+    cache = TieredCache(InMemoryCache())
+    await cache.set("user", 1, "profile")
+    assert cache.get("user") == 1
+    assert await cache.load(["other"]) == 0
+    await cache.delete("user")
+    assert cache.get("user") is None